@@ -6,20 +6,41 @@ This module provides the main chat agent functionality including API communicati
 message handling, conversation management, and interactive features.
 """
 
+import sys
 import json
 import time
-import yaml
+import asyncio
 import requests
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import Generator, List, Dict, Any, Optional
-from datetime import datetime
+from typing import AsyncGenerator, Generator, List, Dict, Any, Optional, Tuple, Deque
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
 from requests.exceptions import RequestException, Timeout
 
+try:
+    import httpx
+except ImportError:
+    # Optional HTTP/2 transport, only used when the http2 config flag is set
+    httpx = None
+
+try:
+    import aiohttp
+except ImportError:
+    # Optional, only needed for call_api_async
+    aiohttp = None
+
 try:
     from colorama import Fore, Style, init as colorama_init
-    colorama_init(autoreset=True)
 except ImportError:
-    # Fallback if colorama is not available
+    colorama_init = None
+
+if colorama_init is not None and sys.stdout.isatty():
+    colorama_init(autoreset=True)
+else:
+    # Fallback if colorama is not available; also used when stdout is not a
+    # terminal, so output carries no escape codes and is not wrapped by colorama
     class Fore:
         RED = GREEN = YELLOW = BLUE = MAGENTA = CYAN = WHITE = RESET = ""
     class Style:
@@ -28,10 +49,28 @@ except ImportError:
 from config import AgentConfig, get_model_config, is_supported_model, get_supported_models
 from utils import (
     setup_directories, setup_logging, create_backup, get_api_key,
-    process_file_inclusions, list_available_files, save_json_file, load_json_file
+    process_file_inclusions, list_available_files, load_history_file,
+    append_jsonl_file, save_jsonl_file, json_loads, json_dumps, load_yaml_file,
+    load_json_file, save_json_file
 )
 from export import ConversationExporter
 
+# Message roles that are sent to the API as conversation turns
+API_ROLES = ("user", "assistant")
+
+# Status line printed before each API call: model name, minutes, seconds
+STATUS_FORMAT = f"{Fore.YELLOW}🤖 Using %s (timeout: %dm %ds)...{Style.RESET_ALL}"
+
+# Transport errors for whichever HTTP client is in use
+TIMEOUT_ERRORS = (Timeout, httpx.TimeoutException) if httpx else (Timeout,)
+REQUEST_ERRORS = (RequestException, httpx.HTTPError) if httpx else (RequestException,)
+ASYNC_TIMEOUT_ERRORS = (asyncio.TimeoutError,)
+ASYNC_REQUEST_ERRORS = (aiohttp.ClientError,) if aiohttp else ()
+
+# Retry policy shared by the sync and async request loops: attempts, then exponential backoff
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1
+
 
 class ClaudeChatAgent:
     """Claude Opus 4/4.1 chat agent with persistence and streaming support"""
@@ -40,6 +79,7 @@ class ClaudeChatAgent:
         self.agent_id = agent_id
         self.base_dir = Path(f"agents/{agent_id}")
         self.api_url = "https://api.anthropic.com/v1/messages"
+        self.history_file = self.base_dir / "history.jsonl"
         
         # Validate model
         if not is_supported_model(model):
@@ -53,34 +93,91 @@ class ClaudeChatAgent:
         
         # Load or create configuration
         self.config = self._load_config(model)
+        self._model_config = get_model_config(self.config.model)
+        
+        # Load conversation history (deques so truncating the oldest entries is O(1)),
+        # counting the log's lines so compaction is measured against the file itself
+        messages, self._history_lines = self._load_history()
+        self.messages: Deque[Dict[str, Any]] = deque(messages)
+        
+        # Messages not yet written to the history log
+        self._unsaved: List[Dict[str, Any]] = []
         
-        # Load conversation history
-        self.messages = self._load_history()
+        # Lowercased message contents, kept in step with self.messages for search
+        self._content_lower: Deque[str] = deque(self._lower_content(m["content"]) for m in self.messages)
+        
+        # History already shaped for the API, reused as the prefix of every payload
+        self._api_messages: Deque[Dict[str, Any]] = deque(
+            self._to_api_message(m) for m in self.messages if m["role"] in API_ROLES
+        )
         
         # Get API key
-        model_display = get_model_config(self.config.model)['name']
+        model_display = self._model_config['name']
         self.api_key = get_api_key(self.base_dir, model_display)
         
+        # Setup HTTP transport (keep-alive connection pool reused across turns)
+        self._session = None
+        self._async_session: Optional["aiohttp.ClientSession"] = None  # created on first async call
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = self._create_http2_client() if self.config.http2 else None
+        if self._client is None:
+            self._session = requests.Session()
+            self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+            self._session.headers.update(self._api_headers())
+        
+        # Token usage reported for the latest reply
+        self.last_usage: Dict[str, Any] = {}
+        
         # Setup exporter
         self.exporter = ConversationExporter(agent_id, self.base_dir / "exports", self.config.to_dict())
         
         self.logger.info(f"Initialized Claude Chat Agent: {agent_id} with model {self.config.model}")
     
+    def _api_headers(self) -> Dict[str, str]:
+        """Static headers sent with every API request"""
+        return {
+            "Content-Type": "application/json",
+            "x-api-key": self.api_key,
+            "anthropic-version": "2023-06-01"
+        }
+    
+    def _create_http2_client(self) -> Optional["httpx.Client"]:
+        """Create an HTTP/2 client that multiplexes requests over one connection"""
+        if httpx is None:
+            self.logger.warning("http2 is enabled but httpx is not installed, using requests")
+            return None
+        
+        try:
+            return httpx.Client(http2=True, headers=self._api_headers(), timeout=self._model_config["timeout"])
+        except ImportError as e:
+            # httpx raises ImportError when the h2 package is missing
+            self.logger.warning(f"HTTP/2 unavailable ({e}), using requests")
+            return None
+    
     def _load_config(self, model: str = None) -> AgentConfig:
-        """Load agent configuration from config.yaml"""
-        config_file = self.base_dir / "config.yaml"
+        """Load agent configuration from config.json"""
+        config_file = self.base_dir / "config.json"
+        legacy_file = self.base_dir / "config.yaml"
         
-        if config_file.exists():
+        if config_file.exists() or legacy_file.exists():
             try:
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config_data = yaml.safe_load(f)
-                    config = AgentConfig(**config_data)
-                    if model and config.model != model:
-                        config.model = model
-                        self._save_config(config)
-                    return config
+                if config_file.exists():
+                    config_data = load_json_file(config_file)
+                else:
+                    # Migrate the old YAML config once; JSON parses far faster on every start
+                    config_data = load_yaml_file(legacy_file)
+                    save_json_file(config_data, config_file)
+                    legacy_file.rename(legacy_file.with_suffix(".yaml.migrated"))
+                    self.logger.info("Migrated config.yaml to config.json")
+                config = AgentConfig.from_dict(config_data)
+                if model and config.model != model:
+                    config.model = model
+                    self._save_config(config)
+                return config
             except Exception as e:
-                self.logger.error(f"Error loading config: {e}")
+                # Keep the unreadable file for the user to fix instead of overwriting it
+                self.logger.error(f"Error loading config, using defaults: {e}")
+                return AgentConfig(model=model or "claude-opus-4-20250514")
         
         # Create new config
         config = AgentConfig(model=model or "claude-opus-4-20250514")
@@ -88,221 +185,359 @@ class ClaudeChatAgent:
         return config
     
     def _save_config(self, config: Optional[AgentConfig] = None):
-        """Save agent configuration to config.yaml"""
+        """Save agent configuration to config.json"""
         if config is None:
             config = self.config
         
         config.updated_at = datetime.now().isoformat()
-        config_file = self.base_dir / "config.yaml"
+        config_file = self.base_dir / "config.json"
         
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                yaml.dump(config.to_dict(), f, default_flow_style=False, allow_unicode=True)
+            save_json_file(config.to_dict(), config_file)
         except Exception as e:
             self.logger.error(f"Error saving config: {e}")
     
-    def _load_history(self) -> List[Dict[str, Any]]:
-        """Load conversation history from history.json"""
-        history_file = self.base_dir / "history.json"
+    def _load_history(self) -> Tuple[List[Dict[str, Any]], int]:
+        """Load conversation history from history.jsonl, with the number of lines in the log"""
+        legacy_file = self.base_dir / "history.json"
+        
+        try:
+            if self.history_file.exists():
+                messages, lines = load_history_file(self.history_file)
+            elif legacy_file.exists():
+                # Migrate the old single-document history to the append-only log
+                messages, lines = load_history_file(legacy_file)
+                save_jsonl_file(messages, self.history_file)
+                legacy_file.rename(legacy_file.with_suffix(".json.migrated"))
+                self.logger.info(f"Migrated {len(messages)} messages from history.json to history.jsonl")
+            else:
+                return [], 0
+        except Exception as e:
+            self.logger.error(f"Error loading history: {e}")
+            return [], 0
         
-        if history_file.exists():
+        usable = [msg for msg in messages if self._backfill_message(msg)]
+        if len(usable) < len(messages):
+            self.logger.warning(f"Skipped {len(messages) - len(usable)} malformed history entries")
+        return usable[-self.config.max_history_size:], lines
+    
+    @staticmethod
+    def _backfill_message(msg: Any) -> bool:
+        """Check a loaded entry has the fields the agent relies on, adding "ts" to older ones"""
+        if not (isinstance(msg, dict) and isinstance(msg.get("role"), str)
+                and isinstance(msg.get("content"), str)):
+            return False
+        if "ts" not in msg:
+            # Older messages only carry the ISO timestamp
+            timestamp = msg.get("timestamp")
+            if not isinstance(timestamp, str):
+                return False
             try:
-                return load_json_file(history_file)
-            except Exception as e:
-                self.logger.error(f"Error loading history: {e}")
-                return []
-        return []
+                msg["ts"] = datetime.fromisoformat(timestamp).timestamp()
+            except ValueError:
+                return False
+        return True
     
-    def _save_history(self):
-        """Save conversation history with backup"""
-        history_file = self.base_dir / "history.json"
-        
-        if history_file.exists():
-            create_backup(history_file, self.base_dir / "backups")
+    def _take_unsaved(self) -> Tuple[List[Dict[str, Any]], Optional[List[Dict[str, Any]]]]:
+        """Hand over the unsaved messages, with a snapshot of the history if the log needs compacting"""
+        pending, self._unsaved = self._unsaved, []
+        if self._history_lines + len(pending) > self.config.max_history_size * 1.25:
+            return pending, list(self.messages)
+        return pending, None
+    
+    def _write_history(self, pending: List[Dict[str, Any]],
+                       snapshot: Optional[List[Dict[str, Any]]]) -> bool:
+        """Append pending messages to the log, or rewrite it from snapshot with a backup.
         
+        Touches no agent state, so it can run in a worker thread.
+        """
         try:
-            save_json_file(self.messages, history_file)
+            if snapshot is None:
+                append_jsonl_file(pending, self.history_file)
+            else:
+                create_backup(self.history_file, self.base_dir / "backups")
+                save_jsonl_file(snapshot, self.history_file)
+            return True
         except Exception as e:
             self.logger.error(f"Error saving history: {e}")
+            return False
     
-    def add_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None):
-        """Add message to conversation history"""
+    def _finish_save(self, pending: List[Dict[str, Any]],
+                     snapshot: Optional[List[Dict[str, Any]]], saved: bool):
+        """Record the outcome of _write_history, keeping failed messages for the next save"""
+        if not saved:
+            self._unsaved[:0] = pending
+        elif snapshot is None:
+            self._history_lines += len(pending)
+        else:
+            self._history_lines = len(snapshot)
+    
+    def _rewrite_history(self):
+        """Rewrite the history log from memory, keeping a backup of the old one"""
+        pending, self._unsaved = self._unsaved, []
+        snapshot = list(self.messages)
+        self._finish_save(pending, snapshot, self._write_history(pending, snapshot))
+    
+    def _save_history(self):
+        """Persist unsaved messages, compacting the log once it is well past the limit"""
+        if not self._unsaved:
+            return
+        pending, snapshot = self._take_unsaved()
+        self._finish_save(pending, snapshot, self._write_history(pending, snapshot))
+    
+    @staticmethod
+    def _lower_content(content: Any) -> str:
+        """Lowercase message content for case-insensitive search"""
+        return content.lower() if isinstance(content, str) else ""
+    
+    @staticmethod
+    def _to_api_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a stored message to the API content-block format"""
+        # add_message is the only writer and always stores text content
+        return {"role": msg["role"], "content": [{"type": "text", "text": msg["content"]}]}
+    
+    def add_message(self, role: str, content: str, metadata: Optional[Dict[str, Any]] = None,
+                    flush: bool = True):
+        """Add message to conversation history (written to disk now, or on the next flush)"""
+        now = time.time()
         message = {
             "role": role,
             "content": content,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": datetime.fromtimestamp(now).isoformat(),
+            "ts": now,
             "metadata": metadata or {}
         }
         
         self.messages.append(message)
-        
-        # Truncate if history is too long
-        if len(self.messages) > self.config.max_history_size:
-            removed = self.messages[:-self.config.max_history_size]
-            self.messages = self.messages[-self.config.max_history_size:]
-            self.logger.info(f"Truncated history: removed {len(removed)} old messages")
-        
-        self._save_history()
-    
-    def _build_api_payload(self, new_message: str, override_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """Build API request payload"""
-        # Process file inclusions
-        processed_message = process_file_inclusions(new_message, self.base_dir, self.logger)
-        
-        messages = []
-        
-        # Add conversation history
-        for msg in self.messages:
-            if msg["role"] in ["user", "assistant"]:
-                content_blocks = []
-                if isinstance(msg["content"], str):
-                    content_blocks.append({"type": "text", "text": msg["content"]})
-                elif isinstance(msg["content"], list):
-                    content_blocks = msg["content"]
-                
-                messages.append({
-                    "role": msg["role"],
-                    "content": content_blocks
-                })
-        
-        # Add new user message
-        messages.append({
+        self._unsaved.append(message)
+        self._content_lower.append(self._lower_content(content))
+        if role in API_ROLES:
+            self._api_messages.append(self._to_api_message(message))
+        
+        # Truncate if history is too long, dropping the oldest entries from every view
+        removed = 0
+        while len(self.messages) > self.config.max_history_size:
+            dropped = self.messages.popleft()
+            self._content_lower.popleft()
+            if dropped["role"] in API_ROLES:
+                self._api_messages.popleft()
+            removed += 1
+        if removed:
+            self.logger.info(f"Truncated history: removed {removed} old messages")
+        
+        if flush:
+            self._save_history()
+    
+    def _build_api_payload(self, processed_message: str, override_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Build API request payload around a message whose file inclusions are already expanded"""
+        # Conversation history (cached in API form) plus the new user message
+        messages = [*self._api_messages, {
             "role": "user",
             "content": [{"type": "text", "text": processed_message}]
-        })
+        }]
         
         # Build payload
         config_dict = self.config.to_dict()
         if override_config:
-            config_dict.update(override_config)
-        
-        model_config = get_model_config(self.config.model)
-        max_tokens = min(config_dict["max_tokens"], model_config["max_output_tokens"])
+            config_dict = {**config_dict, **override_config}
+        
+        max_tokens = min(config_dict["max_tokens"], self._model_config["max_output_tokens"])
+        
+        # Mark the stable prefix (system prompt + history up to the last
+        # assistant turn) as cacheable so the server can reuse it next turn
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i]["role"] == "assistant" and messages[i]["content"]:
+                blocks = messages[i]["content"]
+                messages[i] = {
+                    "role": "assistant",
+                    "content": blocks[:-1] + [{**blocks[-1], "cache_control": {"type": "ephemeral"}}]
+                }
+                break
         
         payload = {
             "model": config_dict["model"],
             "max_tokens": max_tokens,
             "temperature": config_dict["temperature"],
-            "system": config_dict["system_prompt"],
             "stream": config_dict["stream"],
             "messages": messages
         }
         
+        if config_dict["system_prompt"]:
+            payload["system"] = [{
+                "type": "text",
+                "text": config_dict["system_prompt"],
+                "cache_control": {"type": "ephemeral"}
+            }]
+        
         return payload
     
+    def _status_retry_delay(self, status: int, attempt: int) -> Optional[float]:
+        """Backoff before retrying a non-200 status, or None if the status is not retried"""
+        if status == 401:
+            raise ValueError("Invalid API key")
+        if status == 403:
+            raise ValueError("API access forbidden")
+        if status == 429 or status >= 500:
+            delay = RETRY_BASE_DELAY * (2 ** attempt)
+            reason = "Rate limited" if status == 429 else f"Server error {status}"
+            self.logger.warning(f"{reason}, retrying in {delay}s...")
+            return delay
+        self.logger.error(f"API request failed with status {status}")
+        return None
+    
+    def _error_retry_delay(self, error: Exception, attempt: int, timed_out: bool) -> float:
+        """Backoff before retrying after a transport error, raising it once attempts run out"""
+        timeout = self._model_config["timeout"]
+        if timed_out:
+            self.logger.warning(f"Request timed out after {timeout}s (attempt {attempt + 1}/{MAX_RETRIES})")
+            if attempt == MAX_RETRIES - 1:
+                raise Exception(f"Request timed out after {timeout}s") from error
+        else:
+            self.logger.warning(f"Request exception: {error}")
+            if attempt == MAX_RETRIES - 1:
+                raise error
+        return RETRY_BASE_DELAY * (2 ** attempt)
+    
     def _make_api_request(self, payload: Dict[str, Any]) -> requests.Response:
         """Make API request with retries and error handling"""
-        headers = {
-            "Content-Type": "application/json",
-            "x-api-key": self.api_key,
-            "anthropic-version": "2023-06-01"
-        }
-        
-        model_config = get_model_config(self.config.model)
-        timeout = model_config["timeout"]
+        timeout = self._model_config["timeout"]
         
-        max_retries = 3
-        base_delay = 1
+        # Serialize once; retries resend the same bytes (requests sets Content-Length)
+        body = json_dumps(payload)
         
-        for attempt in range(max_retries):
+        for attempt in range(MAX_RETRIES):
             try:
-                self.logger.info(f"Making API request (attempt {attempt + 1}/{max_retries})")
+                self.logger.info(f"Making API request (attempt {attempt + 1}/{MAX_RETRIES})")
                 
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload,
-                    stream=payload.get("stream", True),
-                    timeout=timeout
-                )
+                if self._client is not None:
+                    request = self._client.build_request("POST", self.api_url, content=body)
+                    response = self._client.send(request, stream=payload.get("stream", True))
+                else:
+                    response = self._session.post(
+                        self.api_url,
+                        data=body,
+                        stream=payload.get("stream", True),
+                        timeout=timeout
+                    )
                 
                 if response.status_code == 200:
                     self.logger.info("API request successful")
                     return response
-                elif response.status_code == 401:
-                    raise ValueError("Invalid API key")
-                elif response.status_code == 403:
-                    raise ValueError("API access forbidden")
-                elif response.status_code == 429:
-                    delay = base_delay * (2 ** attempt)
-                    self.logger.warning(f"Rate limited, retrying in {delay}s...")
-                    time.sleep(delay)
-                    continue
-                elif response.status_code >= 500:
-                    delay = base_delay * (2 ** attempt)
-                    self.logger.warning(f"Server error {response.status_code}, retrying in {delay}s...")
-                    time.sleep(delay)
-                    continue
-                else:
-                    self.logger.error(f"API request failed with status {response.status_code}")
+                
+                response.close()
+                delay = self._status_retry_delay(response.status_code, attempt)
+                if delay is None:
                     response.raise_for_status()
+                else:
+                    time.sleep(delay)
                     
-            except Timeout as e:
-                self.logger.warning(f"Request timed out after {timeout}s (attempt {attempt + 1}/{max_retries})")
-                if attempt == max_retries - 1:
-                    raise Exception(f"Request timed out after {timeout}s") from e
-                delay = base_delay * (2 ** attempt)
-                time.sleep(delay)
-            except RequestException as e:
-                self.logger.warning(f"Request exception: {e}")
-                if attempt == max_retries - 1:
-                    raise
-                delay = base_delay * (2 ** attempt)
-                time.sleep(delay)
-        
-        raise Exception(f"Failed to complete API request after {max_retries} attempts")
+            except TIMEOUT_ERRORS as e:
+                time.sleep(self._error_retry_delay(e, attempt, timed_out=True))
+            except REQUEST_ERRORS as e:
+                time.sleep(self._error_retry_delay(e, attempt, timed_out=False))
+        
+        raise Exception(f"Failed to complete API request after {MAX_RETRIES} attempts")
+    
+    def _log_usage(self, usage: Dict[str, Any]):
+        """Log token usage, including prompt cache hits"""
+        if usage:
+            self.logger.info(
+                f"Token usage: input={usage.get('input_tokens', 0)}, "
+                f"output={usage.get('output_tokens', 0)}, "
+                f"cache_read={usage.get('cache_read_input_tokens', 0)}, "
+                f"cache_write={usage.get('cache_creation_input_tokens', 0)}"
+            )
+    
+    @staticmethod
+    def _split_sse_data(buffer: bytes) -> Tuple[List[bytes], bytes]:
+        """Split complete SSE lines off a byte buffer, returning their "data:" payloads and the rest"""
+        payloads = []
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line = buffer[start:end]
+            start = end + 1
+            if line.startswith(b"data: "):
+                payloads.append(line[6:].rstrip(b"\r"))
+        return payloads, buffer[start:]
+    
+    def _decode_stream_event(self, data: bytes) -> str:
+        """Decode one SSE data payload, returning its text delta (empty if none)"""
+        # Cheap substring checks skip ping/content_block_start/stop events
+        # (and a trailing [DONE]) without a full JSON parse
+        try:
+            if b'"content_block_delta"' in data:
+                event = json_loads(data)
+                if event.get("type") == "content_block_delta":
+                    return event.get("delta", {}).get("text", "")
+            elif b'"message_start"' in data:
+                event = json_loads(data)
+                if event.get("type") == "message_start":
+                    self.last_usage = dict(event.get("message", {}).get("usage", {}))
+            elif b'"message_delta"' in data:
+                event = json_loads(data)
+                if event.get("type") == "message_delta":
+                    # Output token counts come with the closing message_delta
+                    self.last_usage.update(event.get("usage", {}))
+        except json.JSONDecodeError as e:
+            self.logger.warning(f"Invalid JSON in stream: {data!r} - {e}")
+        return ""
+    
+    def _stream_deltas(self, buffer: bytes, chunk: bytes) -> Tuple[List[str], bytes]:
+        """Text deltas completed by one raw stream chunk, and the partial line carried to the next"""
+        payloads, buffer = self._split_sse_data(buffer + chunk)
+        return [text for text in map(self._decode_stream_event, payloads) if text], buffer
+    
+    def _finish_stream(self, parts: List[str]):
+        """Log the stream's token usage and store the complete assistant message"""
+        self._log_usage(self.last_usage)
+        accumulated_text = "".join(parts)
+        if accumulated_text.strip():
+            self.add_message("assistant", accumulated_text, flush=False)
     
     def _parse_streaming_response(self, response: requests.Response) -> Generator[str, None, None]:
         """Parse streaming response from Anthropic API"""
-        accumulated_text = ""
+        parts = []
+        self.last_usage = {}
         
         try:
-            for line in response.iter_lines():
-                if not line:
-                    continue
-                line = line.decode('utf-8').strip()
-                
-                if line.startswith('data: '):
-                    data_str = line[6:]
-                    if data_str == '[DONE]':
-                        break
-                    
-                    try:
-                        event = json.loads(data_str)
-                        
-                        if event.get("type") == "content_block_delta":
-                            delta_text = event.get("delta", {}).get("text", "")
-                            if delta_text:
-                                accumulated_text += delta_text
-                                yield delta_text
-                        elif event.get("type") == "message_stop":
-                            break
-                            
-                    except json.JSONDecodeError as e:
-                        self.logger.warning(f"Invalid JSON in stream: {data_str} - {e}")
-                        continue
+            if self._client is not None:
+                chunks = response.iter_bytes(chunk_size=4096)
+            else:
+                chunks = response.iter_content(chunk_size=4096)
+            
+            # Reading continues after "message_stop" so the stream is fully
+            # consumed and the connection goes back to the pool
+            buffer = b""
+            for chunk in chunks:
+                deltas, buffer = self._stream_deltas(buffer, chunk)
+                parts.extend(deltas)
+                yield from deltas
                         
         except Exception as e:
             self.logger.error(f"Error parsing streaming response: {e}")
+        finally:
+            response.close()
         
-        # Save complete assistant message
-        if accumulated_text.strip():
-            self.add_message("assistant", accumulated_text)
+        self._finish_stream(parts)
+    
+    def _parse_message_data(self, data: Dict[str, Any]) -> str:
+        """Extract and store the reply text from a complete (non-streaming) API message"""
+        self.last_usage = dict(data.get("usage", {}))
+        self._log_usage(self.last_usage)
+        
+        content_blocks = data.get("content", [])
+        if content_blocks and len(content_blocks) > 0:
+            text_content = content_blocks[0].get("text", "")
+            if text_content:
+                self.add_message("assistant", text_content, flush=False)
+                return text_content
+        
+        return "No response content received"
     
     def _parse_non_streaming_response(self, response: requests.Response) -> str:
         """Parse non-streaming response from Anthropic API"""
         try:
-            data = response.json()
-            
-            content_blocks = data.get("content", [])
-            if content_blocks and len(content_blocks) > 0:
-                text_content = content_blocks[0].get("text", "")
-                if text_content:
-                    self.add_message("assistant", text_content)
-                    return text_content
-            
-            return "No response content received"
-            
+            return self._parse_message_data(response.json())
         except Exception as e:
             self.logger.error(f"Error parsing non-streaming response: {e}")
             return f"Error parsing response: {e}"
@@ -310,18 +545,19 @@ class ClaudeChatAgent:
     def call_api(self, new_message: str, override_config: Optional[Dict[str, Any]] = None) -> Generator[str, None, None]:
         """Call Claude API with new message"""
         try:
-            # Add user message to history
-            self.add_message("user", new_message)
+            # Add user message to history (written together with the reply)
+            self.add_message("user", new_message, flush=False)
             
-            # Build payload
-            payload = self._build_api_payload(new_message, override_config)
+            # Process file inclusions and build payload
+            processed_message = process_file_inclusions(new_message, self.base_dir, self.logger)
+            payload = self._build_api_payload(processed_message, override_config)
             self.logger.info(f"Making API call to {self.api_url}")
             
             # Make request
-            model_config = get_model_config(self.config.model)
+            model_config = self._model_config
             timeout = model_config["timeout"]
             
-            print(f"{Fore.YELLOW}🤖 Using {model_config['name']} (timeout: {timeout//60}m {timeout%60}s)...{Style.RESET_ALL}")
+            print(STATUS_FORMAT % (model_config['name'], timeout // 60, timeout % 60))
             
             response = self._make_api_request(payload)
             
@@ -336,12 +572,153 @@ class ClaudeChatAgent:
             error_msg = f"API call failed: {e}"
             self.logger.error(error_msg)
             yield json.dumps({"error": error_msg})
+        finally:
+            # One history write per turn, even if the stream fails or is closed early
+            self._save_history()
+    
+    async def _make_api_request_async(self, session: "aiohttp.ClientSession",
+                                      payload: Dict[str, Any]) -> "aiohttp.ClientResponse":
+        """Make API request with retries without blocking the event loop"""
+        timeout = aiohttp.ClientTimeout(total=self._model_config["timeout"])
+        body = json_dumps(payload)
+        
+        for attempt in range(MAX_RETRIES):
+            try:
+                self.logger.info(f"Making async API request (attempt {attempt + 1}/{MAX_RETRIES})")
+                
+                response = await session.post(self.api_url, data=body, timeout=timeout)
+                if response.status == 200:
+                    self.logger.info("API request successful")
+                    return response
+                
+                response.release()
+                delay = self._status_retry_delay(response.status, attempt)
+                if delay is None:
+                    response.raise_for_status()
+                else:
+                    await asyncio.sleep(delay)
+                    
+            except ASYNC_TIMEOUT_ERRORS as e:
+                await asyncio.sleep(self._error_retry_delay(e, attempt, timed_out=True))
+            except ASYNC_REQUEST_ERRORS as e:
+                await asyncio.sleep(self._error_retry_delay(e, attempt, timed_out=False))
+        
+        raise Exception(f"Failed to complete API request after {MAX_RETRIES} attempts")
+    
+    def _get_async_session(self) -> "aiohttp.ClientSession":
+        """The agent's aiohttp session, reused across async calls for keep-alive"""
+        loop = asyncio.get_running_loop()
+        session = self._async_session
+        if session is None or session.closed or self._async_loop is not loop:
+            # A session is bound to the loop it was created on (e.g. one asyncio.run per turn)
+            if session is not None and not session.closed:
+                self.logger.warning("Event loop changed without aclose(), dropping the open aiohttp session")
+            session = aiohttp.ClientSession(
+                headers=self._api_headers(),
+                connector=aiohttp.TCPConnector(limit=8, keepalive_timeout=60)
+            )
+            self._async_session, self._async_loop = session, loop
+        return session
+    
+    async def call_api_async(self, new_message: str,
+                             override_config: Optional[Dict[str, Any]] = None) -> AsyncGenerator[str, None]:
+        """Call Claude API with new message using aiohttp (async counterpart of call_api).
+        
+        The aiohttp session is reused across calls on the same event loop; release it
+        with aclose() (or use the agent as an async context manager) before that loop ends.
+        """
+        if aiohttp is None:
+            raise ImportError("call_api_async requires the aiohttp package")
+        
+        try:
+            self.add_message("user", new_message, flush=False)
+            # Included files are read from disk, so expand them off the event loop
+            processed_message = await asyncio.to_thread(
+                process_file_inclusions, new_message, self.base_dir, self.logger
+            )
+            payload = self._build_api_payload(processed_message, override_config)
+            self.logger.info(f"Making async API call to {self.api_url}")
+            
+            session = self._get_async_session()
+            response = await self._make_api_request_async(session, payload)
+            
+            try:
+                if payload.get("stream", True):
+                    parts = []
+                    buffer = b""
+                    self.last_usage = {}
+                    async for chunk in response.content.iter_any():
+                        deltas, buffer = self._stream_deltas(buffer, chunk)
+                        parts.extend(deltas)
+                        for delta_text in deltas:
+                            yield delta_text
+                    
+                    self._finish_stream(parts)
+                else:
+                    yield self._parse_message_data(json_loads(await response.read()))
+            finally:
+                response.release()
+                
+        except Exception as e:
+            error_msg = f"API call failed: {e}"
+            self.logger.error(error_msg)
+            yield json.dumps({"error": error_msg})
+        finally:
+            # Write the turn in a worker thread so the event loop keeps running; the unsaved
+            # messages are handed over here so add_message never races the writer
+            if self._unsaved:
+                pending, snapshot = self._take_unsaved()
+                saved = await asyncio.to_thread(self._write_history, pending, snapshot)
+                self._finish_save(pending, snapshot, saved)
+    
+    async def aclose(self):
+        """Close every HTTP transport, including the aiohttp session of async calls"""
+        session, loop = self._async_session, self._async_loop
+        self._async_session = self._async_loop = None
+        if session is not None and not session.closed:
+            if loop is asyncio.get_running_loop():
+                await session.close()
+            else:
+                self.logger.warning("aiohttp session belongs to another event loop and was not closed")
+        self.close()
+    
+    async def __aenter__(self) -> "ClaudeChatAgent":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+    
+    def flush_logs(self):
+        """Write buffered log records to the log file now"""
+        for handler in self.logger.handlers:
+            handler.flush()
+    
+    def _close_transports(self):
+        """Close the HTTP session and client, releasing pooled connections"""
+        session = getattr(self, "_session", None)  # also runs from __del__ of a half-built agent
+        if session is not None:
+            session.close()
+            self._session = None
+        client = getattr(self, "_client", None)
+        if client is not None:
+            client.close()
+            self._client = None
+    
+    def close(self):
+        """Close the HTTP session, release pooled connections and flush the log (async callers use aclose)"""
+        self._close_transports()
+        self.flush_logs()
+    
+    def __del__(self):
+        # No event loop or file work here: an aiohttp session is only closed by aclose()
+        self._close_transports()
     
     def clear_history(self):
         """Clear conversation history"""
-        create_backup(self.base_dir / "history.json", self.base_dir / "backups")
         self.messages.clear()
-        self._save_history()
+        self._content_lower.clear()
+        self._api_messages.clear()
+        self._rewrite_history()
         self.logger.info("Conversation history cleared")
     
     def get_statistics(self) -> Dict[str, Any]:
@@ -358,39 +735,54 @@ class ClaudeChatAgent:
                 "conversation_duration": None
             }
         
-        user_msgs = [m for m in self.messages if m["role"] == "user"]
-        assistant_msgs = [m for m in self.messages if m["role"] == "assistant"]
+        # Count roles and characters in a single pass
+        user_count = assistant_count = total_chars = 0
+        for m in self.messages:
+            total_chars += len(m["content"])
+            role = m["role"]
+            if role == "user":
+                user_count += 1
+            elif role == "assistant":
+                assistant_count += 1
         
-        total_chars = sum(len(m["content"]) for m in self.messages)
-        avg_length = total_chars // len(self.messages) if self.messages else 0
+        total_messages = len(self.messages)
+        avg_length = total_chars // total_messages
         
-        first_time = datetime.fromisoformat(self.messages[0]["timestamp"])
-        last_time = datetime.fromisoformat(self.messages[-1]["timestamp"])
-        duration = last_time - first_time
+        first_ts = self.messages[0]["ts"]
+        last_ts = self.messages[-1]["ts"]
+        duration = timedelta(seconds=max(0, int(last_ts - first_ts)))
         
         return {
-            "total_messages": len(self.messages),
-            "user_messages": len(user_msgs),
-            "assistant_messages": len(assistant_msgs),
+            "total_messages": total_messages,
+            "user_messages": user_count,
+            "assistant_messages": assistant_count,
             "total_characters": total_chars,
             "average_message_length": avg_length,
-            "first_message": first_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "last_message": last_time.strftime("%Y-%m-%d %H:%M:%S"),
-            "conversation_duration": str(duration).split('.')[0] if duration.total_seconds() > 0 else "0:00:00"
+            "first_message": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(first_ts)),
+            "last_message": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(last_ts)),
+            "conversation_duration": str(duration)
         }
     
-    def export_conversation(self, format_type: str) -> str:
+    def export_conversation(self, format_type: str, indent: bool = False, compress: bool = False) -> str:
         """Export conversation in specified format"""
         statistics = self.get_statistics()
-        return self.exporter.export(self.messages, format_type, statistics)
+        return self.exporter.export(list(self.messages), format_type, statistics, indent=indent, compress=compress)
+    
+    def tail(self, n: int) -> List[Dict[str, Any]]:
+        """Return the last n messages, oldest first, without copying the whole history"""
+        if n <= 0:
+            return []
+        recent = list(islice(reversed(self.messages), n))
+        recent.reverse()
+        return recent
     
     def search_history(self, term: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Search conversation history for term"""
         results = []
         term_lower = term.lower()
         
-        for i, msg in enumerate(self.messages):
-            if term_lower in msg["content"].lower():
+        for i, (msg, content_lower) in enumerate(zip(self.messages, self._content_lower)):
+            if term_lower in content_lower:
                 results.append({
                     "index": i,
                     "message": msg,
@@ -417,5 +809,8 @@ class ClaudeChatAgent:
         if not self.config.validate():
             raise ValueError("Invalid configuration parameters")
         
+        if "model" in override_config:
+            self._model_config = get_model_config(self.config.model)
+        
         self.config.updated_at = datetime.now().isoformat()
         self._save_config()
\ No newline at end of file
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the file inclusion helpers in utils.py
+
+Run from the repository root:
+
+    python benchmarks/bench_utils.py
+
+Each benchmark runs in a scratch working directory laid out like a small
+project (one agent, a src/ directory and an uploads/ directory) and prints
+the best of five timings.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utils  # noqa: E402
+
+
+def _best_of(fn, repeat: int = 5, number: int = 2000) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _setup_tree() -> Path:
+    for directory in ("src", "agents/bench/uploads"):
+        os.makedirs(directory)
+    Path("a.py").write_text("print(1)\n")
+    Path("src/app.js").write_text("console.log(1)\n")
+    Path("agents/bench/uploads/data.csv").write_text("a,b\n1,2\n")
+    return Path("agents/bench")
+
+
+def main():
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            _run(_setup_tree())
+        finally:
+            # Leave the scratch directory so it can be removed
+            os.chdir(cwd)
+
+
+def _run(base_dir: Path):
+    logger = logging.getLogger("bench")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+    
+    inclusion = _best_of(lambda: utils.process_file_inclusions(
+        "see {a.py} and {nothere.md}", base_dir, logger))
+    print(f"process_file_inclusions x2000: {inclusion:.3f}s")
+    
+    listing = _best_of(lambda: utils.list_available_files(base_dir), number=200)
+    print(f"list_available_files x200:     {listing:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,12 +6,15 @@ This module provides configuration management using dataclasses for both
 Claude Opus 4 and 4.1 models with comprehensive validation and defaults.
 """
 
-from dataclasses import dataclass, asdict
-from typing import Optional, Dict, Any
+import os
+import sys
+from dataclasses import dataclass, field, fields
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Mapping
 from datetime import datetime
 
 
-@dataclass
+@dataclass(slots=True)
 class AgentConfig:
     """Configuration parameters for Claude Opus 4/4.1 chat agent"""
     model: str = "claude-opus-4-20250514"  # Default to Opus 4
@@ -23,8 +26,10 @@ class AgentConfig:
     top_p: float = 1.0
     frequency_penalty: float = 0.0
     presence_penalty: float = 0.0
+    http2: bool = False  # Use httpx with HTTP/2 instead of requests
     created_at: str = ""
     updated_at: str = ""
+    _dict_cache: Optional[Dict[str, Any]] = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         """Set timestamps after initialization"""
@@ -33,14 +38,37 @@ class AgentConfig:
             self.created_at = now
         self.updated_at = now
 
+    def __setattr__(self, name: str, value: Any):
+        """Set attribute and invalidate the cached dictionary"""
+        object.__setattr__(self, name, value)
+        if name != "_dict_cache":
+            object.__setattr__(self, "_dict_cache", None)
+
     def to_dict(self) -> Dict[str, Any]:
-        """Convert configuration to dictionary"""
-        return asdict(self)
+        """Convert configuration to dictionary (cached, treat as read-only)"""
+        if self._dict_cache is None:
+            self._dict_cache = {
+                "model": self.model,
+                "temperature": self.temperature,
+                "max_tokens": self.max_tokens,
+                "max_history_size": self.max_history_size,
+                "stream": self.stream,
+                "system_prompt": self.system_prompt,
+                "top_p": self.top_p,
+                "frequency_penalty": self.frequency_penalty,
+                "presence_penalty": self.presence_penalty,
+                "http2": self.http2,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+        return self._dict_cache
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'AgentConfig':
-        """Create configuration from dictionary"""
-        return cls(**data)
+        """Create configuration from dictionary, ignoring unknown keys"""
+        # Configs written by older versions may carry dropped fields such as message_count
+        known = {f.name for f in fields(cls) if f.init}
+        return cls(**{key: value for key, value in data.items() if key in known})
 
     def validate(self) -> bool:
         """Validate configuration parameters"""
@@ -59,24 +87,24 @@ class AgentConfig:
         return True
 
 
-# Supported models configuration
+# Supported models configuration (read-only, since callers cache these mappings)
 SUPPORTED_MODELS = {
-    "claude-opus-4-20250514": {
+    "claude-opus-4-20250514": MappingProxyType({
         "name": "Claude Opus 4",
         "description": "Claude Opus 4 model from Anthropic",
         "timeout": 300,
         "max_output_tokens": 32000
-    },
-    "claude-opus-4-1-20250805": {
+    }),
+    "claude-opus-4-1-20250805": MappingProxyType({
         "name": "Claude Opus 4.1", 
         "description": "Claude Opus 4.1 model from Anthropic",
         "timeout": 300,
         "max_output_tokens": 32000
-    }
+    })
 }
 
-# Supported file extensions for file inclusion
-SUPPORTED_EXTENSIONS = {
+# Supported file extensions for file inclusion (lowercase, checked case-insensitively)
+SUPPORTED_EXTENSIONS = frozenset(sys.intern(ext.lower()) for ext in (
     # Programming languages
     '.py', '.r', '.js', '.ts', '.jsx', '.tsx', '.java', '.c', '.cpp', '.cc', '.cxx',
     '.h', '.hpp', '.cs', '.php', '.rb', '.go', '.rs', '.swift', '.kt', '.scala',
@@ -88,7 +116,7 @@ SUPPORTED_EXTENSIONS = {
 
     # Data and markup
     '.md', '.markdown', '.rst', '.tex', '.latex', '.csv', '.tsv', '.jsonl', '.ndjson',
-    '.xml', '.svg', '.rss', '.atom', '.plist',
+    '.svg', '.rss', '.atom', '.plist',
 
     # Configuration and infrastructure
     '.tf', '.tfvars', '.hcl', '.nomad', '.consul', '.vault', '.k8s', '.kubectl',
@@ -99,7 +127,7 @@ SUPPORTED_EXTENSIONS = {
     '.readme', '.license', '.changelog', '.authors', '.contributors', '.todo',
 
     # Notebooks and scripts
-    '.ipynb', '.rmd', '.qmd', '.jl', '.m', '.octave', '.R', '.Rmd',
+    '.ipynb', '.rmd', '.qmd', '.jl', '.m', '.octave',
 
     # Web and API
     '.graphql', '.gql', '.rest', '.http', '.api', '.postman', '.insomnia',
@@ -107,10 +135,18 @@ SUPPORTED_EXTENSIONS = {
     # Other useful formats
     '.editorconfig', '.gitignore', '.gitattributes', '.dockerignore', '.eslintrc',
     '.prettierrc', '.babelrc', '.webpack', '.rollup', '.vite', '.parcel'
-}
+))
+
+
+def is_supported_ext(path: str) -> bool:
+    """Check if a file name or path has a supported extension"""
+    dot = path.rfind(".")
+    # As with Path.suffix, the leading dot of a dotfile (.env) does not start an extension
+    name_start = max(path.rfind(os.sep), path.rfind(os.altsep) if os.altsep else -1) + 1
+    return dot > name_start and path[dot:].lower() in SUPPORTED_EXTENSIONS
 
 
-def get_model_config(model: str) -> Dict[str, Any]:
+def get_model_config(model: str) -> Mapping[str, Any]:
     """Get configuration for a specific model"""
     return SUPPORTED_MODELS.get(model, SUPPORTED_MODELS["claude-opus-4-20250514"])
 
@@ -120,6 +156,6 @@ def is_supported_model(model: str) -> bool:
     return model in SUPPORTED_MODELS
 
 
-def get_supported_models() -> Dict[str, Dict[str, Any]]:
+def get_supported_models() -> Dict[str, Mapping[str, Any]]:
     """Get all supported models"""
     return SUPPORTED_MODELS.copy()
\ No newline at end of file
@@ -0,0 +1,6 @@
+# Optional Cython declarations for export.py (pure-Python mode).
+# Only used when building with ENABLE_SPEEDUPS=1; export.py runs unchanged without it.
+import cython
+
+@cython.locals(timestamp_str=str, role=str, content=str, content_escaped=str, avatar_html=str)
+cpdef str _render_html_message(object msg, object escape)
@@ -6,118 +6,49 @@ This module provides conversation export functionality in JSON, TXT, MD, and HTM
 with proper formatting and styling for each format.
 """
 
-import json
-import html
+import re
+import functools
 from pathlib import Path
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional, NamedTuple, Iterable, IO, Mapping
+from datetime import datetime, timedelta
 
 from config import get_model_config
+from utils import json_dumps
 
+# Export file buffer; fewer write(2) calls for the many small per-message writes
+_WRITE_BUFFER_SIZE = 256 * 1024
 
-class ConversationExporter:
-    """Handle conversation export in multiple formats"""
-    
-    def __init__(self, agent_id: str, export_dir: Path, config: Dict[str, Any]):
-        self.agent_id = agent_id
-        self.export_dir = export_dir
-        self.config = config
-        self.model_config = get_model_config(config.get('model', 'claude-opus-4-20250514'))
-        
-    def export(self, messages: List[Dict[str, Any]], format_type: str, statistics: Dict[str, Any]) -> str:
-        """Export conversation in specified format"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if format_type == "json":
-            return self._export_json(messages, timestamp, statistics)
-        elif format_type == "txt":
-            return self._export_txt(messages, timestamp)
-        elif format_type == "md":
-            return self._export_markdown(messages, timestamp)
-        elif format_type == "html":
-            return self._export_html(messages, timestamp, statistics)
-        else:
-            raise ValueError(f"Unsupported export format: {format_type}")
-    
-    def _export_json(self, messages: List[Dict[str, Any]], timestamp: str, statistics: Dict[str, Any]) -> str:
-        """Export as JSON format"""
-        filename = f"conversation_{timestamp}.json"
-        filepath = self.export_dir / filename
-        
-        export_data = {
-            "agent_id": self.agent_id,
-            "exported_at": datetime.now().isoformat(),
-            "config": self.config,
-            "messages": messages,
-            "statistics": statistics
-        }
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
-        
-        return str(filepath)
-    
-    def _export_txt(self, messages: List[Dict[str, Any]], timestamp: str) -> str:
-        """Export as plain text format"""
-        filename = f"conversation_{timestamp}.txt"
-        filepath = self.export_dir / filename
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"Anthropic {self.model_config['name']} Chat Agent Conversation Export\n")
-            f.write(f"Agent ID: {self.agent_id}\n")
-            f.write(f"Model: {self.config.get('model', 'Unknown')}\n")
-            f.write(f"Exported: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 50 + "\n\n")
-            
-            for msg in messages:
-                timestamp_str = datetime.fromisoformat(msg["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-                f.write(f"[{timestamp_str}] {msg['role'].upper()}:\n")
-                f.write(f"{msg['content']}\n\n")
-        
-        return str(filepath)
-    
-    def _export_markdown(self, messages: List[Dict[str, Any]], timestamp: str) -> str:
-        """Export as Markdown format"""
-        filename = f"conversation_{timestamp}.md"
-        filepath = self.export_dir / filename
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f"# Anthropic {self.model_config['name']} Chat Agent Conversation\n\n")
-            f.write(f"**Agent ID:** {self.agent_id}  \n")
-            f.write(f"**Model:** {self.config.get('model', 'Unknown')}  \n")
-            f.write(f"**Exported:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}  \n\n")
-            
-            for msg in messages:
-                timestamp_str = datetime.fromisoformat(msg["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-                role_emoji = "🧑" if msg["role"] == "user" else "🤖"
-                f.write(f"## {role_emoji} {msg['role'].title()} - {timestamp_str}\n\n")
-                f.write(f"{msg['content']}\n\n")
-        
-        return str(filepath)
-    
-    def _export_html(self, messages: List[Dict[str, Any]], timestamp: str, statistics: Dict[str, Any]) -> str:
-        """Export as HTML format with styling"""
-        filename = f"conversation_{timestamp}.html"
-        filepath = self.export_dir / filename
-        
-        html_content = self._generate_html_content(messages, statistics)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return str(filepath)
-    
-    def _generate_html_content(self, messages: List[Dict[str, Any]], statistics: Dict[str, Any]) -> str:
-        """Generate complete HTML content with styling"""
-        model_display = self.model_config['name']
-        
-        # HTML template with modern styling
-        html_template = f"""<!DOCTYPE html>
+# HTML exports with fewer messages are joined in memory, larger ones are streamed
+_HTML_STREAM_THRESHOLD = 64
+
+# Markdown heading emoji per role (anything else renders as the assistant)
+_ROLE_EMOJI = {"user": "🧑", "assistant": "🤖"}
+
+# Precomputed role labels for the txt/markdown headings (other roles are cased on the fly)
+_ROLE_UPPER = {"user": "USER", "assistant": "ASSISTANT"}
+_ROLE_TITLE = {"user": "User", "assistant": "Assistant"}
+
+# Pre-rendered avatar fragments per role (anything else renders as the assistant)
+_ASSISTANT_AVATAR_HTML = '<div class="message-avatar">AI</div>'
+_AVATAR_HTML = {
+    "user": '<div class="message-avatar">U</div>',
+    "assistant": _ASSISTANT_AVATAR_HTML,
+}
+
+# Characters html.escape would replace
+_NEEDS_ESCAPE = re.compile(r'[&<>"\']')
+
+# A fenced code block; an unclosed fence runs to the end of the message
+_CODE_BLOCK_RE = re.compile(r'```(.*?)(?:```|\Z)', re.DOTALL)
+
+
+# HTML document template with modern styling (str.format_map placeholders)
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Anthropic {model_display} Conversation - {self.agent_id}</title>
+    <title>Anthropic {model_display} Conversation - {agent_id}</title>
     <style>
         :root {{
             --primary-color: #2563eb;
@@ -323,37 +254,37 @@ class ConversationExporter:
             <h1>🤖 Anthropic {model_display} Chat Agent</h1>
             <p>Conversation Export</p>
             <div class="header-info">
-                <div><strong>Agent ID:</strong> {self.agent_id}</div>
-                <div><strong>Model:</strong> {self.config.get('model', 'Unknown')}</div>
-                <div><strong>Exported:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</div>
-                <div><strong>Temperature:</strong> {self.config.get('temperature', 1.0)}</div>
+                <div><strong>Agent ID:</strong> {agent_id}</div>
+                <div><strong>Model:</strong> {model}</div>
+                <div><strong>Exported:</strong> {exported}</div>
+                <div><strong>Temperature:</strong> {temperature}</div>
             </div>
         </div>
 
         <div class="stats">
             <div class="stats-grid">
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('total_messages', 0)}</div>
+                    <div class="stat-value">{total_messages}</div>
                     <div class="stat-label">Total Messages</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('user_messages', 0)}</div>
+                    <div class="stat-value">{user_messages}</div>
                     <div class="stat-label">User Messages</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('assistant_messages', 0)}</div>
+                    <div class="stat-value">{assistant_messages}</div>
                     <div class="stat-label">Assistant Messages</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('total_characters', 0):,}</div>
+                    <div class="stat-value">{total_characters:,}</div>
                     <div class="stat-label">Total Characters</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('average_message_length', 0):,}</div>
+                    <div class="stat-value">{average_message_length:,}</div>
                     <div class="stat-label">Avg Message Length</div>
                 </div>
                 <div class="stat-item">
-                    <div class="stat-value">{statistics.get('conversation_duration', 'N/A')}</div>
+                    <div class="stat-value">{conversation_duration}</div>
                     <div class="stat-label">Duration</div>
                 </div>
             </div>
@@ -361,31 +292,70 @@ class ConversationExporter:
 
         <div class="messages">"""
 
-        # Generate messages
-        for msg in messages:
-            timestamp_str = datetime.fromisoformat(msg["timestamp"]).strftime("%Y-%m-%d %H:%M:%S")
-            role = msg["role"]
-            content = msg["content"]
-            
-            # Escape HTML content
-            content_escaped = html.escape(content)
-            
-            # Handle code blocks
-            if '```' in content_escaped:
-                parts = content_escaped.split('```')
-                formatted_content = ""
-                for i, part in enumerate(parts):
-                    if i % 2 == 1:  # Code block
-                        formatted_content += f'<div class="code-block">{part}</div>'
-                    else:  # Regular text
-                        formatted_content += part
-                content_escaped = formatted_content
-            
-            avatar_text = "U" if role == "user" else "AI"
-            
-            html_template += f"""
+_HTML_FOOTER = """
+        </div>
+
+        <div class="footer">
+            Generated by Anthropic {model_display} Chat Agent • Agent ID: {agent_id} • {exported}
+        </div>
+    </div>
+</body>
+</html>"""
+
+
+@functools.lru_cache(maxsize=2048)
+def _fmt_ts(timestamp: str) -> str:
+    """Format an ISO timestamp for display (cached, timestamps repeat across exports)"""
+    return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _code_block_html(match: re.Match) -> str:
+    """Wrap a matched code block body in its HTML container"""
+    return f'<div class="code-block">{match.group(1)}</div>'
+
+
+def _open_export(filepath: Path, compress: bool, binary: bool = False) -> IO:
+    """Open an export file for writing, gzip-compressed at the fastest level if requested"""
+    if compress:
+        import gzip  # deferred: only needed for compressed exports
+        if binary:
+            return gzip.open(filepath, 'wb', compresslevel=1)
+        return gzip.open(filepath, 'wt', encoding='utf-8', compresslevel=1)
+    if binary:
+        return open(filepath, 'wb')
+    return open(filepath, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE)
+
+
+class ExportMessage(NamedTuple):
+    """The message fields the text renderers read, with attribute access"""
+    role: str
+    content: str
+    timestamp: str
+
+
+def _to_export_messages(messages: Iterable[Dict[str, Any]]) -> List[ExportMessage]:
+    """Convert history dicts once per export instead of per-field lookups in the loops"""
+    return [ExportMessage(m["role"], m["content"], m["timestamp"]) for m in messages]
+
+
+def _render_html_message(msg: ExportMessage, escape) -> str:
+    """Render a single message as HTML (typed by export.pxd when compiled)"""
+    timestamp_str = _fmt_ts(msg.timestamp)
+    role = msg.role
+    content = msg.content
+    
+    # Escape HTML content (plain prose skips the transform entirely)
+    content_escaped = escape(content) if _NEEDS_ESCAPE.search(content) else content
+    
+    # Handle code blocks in a single regex pass
+    if '```' in content_escaped:
+        content_escaped = _CODE_BLOCK_RE.sub(_code_block_html, content_escaped)
+    
+    avatar_html = _AVATAR_HTML.get(role, _ASSISTANT_AVATAR_HTML)
+    
+    return f"""
             <div class="message {role}">
-                <div class="message-avatar">{avatar_text}</div>
+                {avatar_html}
                 <div class="message-content">
                     <div class="message-header">
                         <span class="message-role">{role}</span>
@@ -395,15 +365,193 @@ class ConversationExporter:
                 </div>
             </div>"""
 
-        # Close HTML structure
-        html_template += f"""
-        </div>
 
-        <div class="footer">
-            Generated by Anthropic {model_display} Chat Agent • Agent ID: {self.agent_id} • {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-        </div>
-    </div>
-</body>
-</html>"""
-
-        return html_template
\ No newline at end of file
+class ConversationExporter:
+    """Handle conversation export in multiple formats"""
+    
+    def __init__(self, agent_id: str, export_dir: Path, config: Dict[str, Any]):
+        self.agent_id = agent_id
+        self.export_dir = export_dir
+        self.config = config
+    
+    @functools.cached_property
+    def model_config(self) -> Mapping[str, Any]:
+        """Model configuration, resolved on first export rather than at construction"""
+        return get_model_config(self.config.get('model', 'claude-opus-4-20250514'))
+        
+    def export(self, messages: List[Dict[str, Any]], format_type: str,
+               statistics: Optional[Dict[str, Any]] = None,
+               indent: bool = False, compress: bool = False) -> str:
+        """Export conversation in specified format (JSON is compact unless indent is set)
+        
+        With compress=True the file is gzip-compressed and gets a .gz suffix.
+        Statistics are computed from the messages when not supplied.
+        """
+        if statistics is None:
+            statistics = self._compute_stats(messages)
+        
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
+        now_str = now.strftime("%Y-%m-%d %H:%M:%S")
+        
+        if format_type == "json":
+            return self._export_json(messages, timestamp, statistics, now, indent, compress)
+        elif format_type == "txt":
+            return self._export_txt(messages, timestamp, now_str, compress)
+        elif format_type == "md":
+            return self._export_markdown(messages, timestamp, now_str, compress)
+        elif format_type == "html":
+            return self._export_html(messages, timestamp, statistics, now_str, compress)
+        else:
+            raise ValueError(f"Unsupported export format: {format_type}")
+    
+    @staticmethod
+    def _compute_stats(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Compute conversation statistics in a single pass over the messages"""
+        user_count = assistant_count = total_chars = 0
+        for msg in messages:
+            total_chars += len(msg["content"])
+            role = msg["role"]
+            if role == "user":
+                user_count += 1
+            elif role == "assistant":
+                assistant_count += 1
+        
+        total_messages = len(messages)
+        duration = None
+        if messages:
+            first = datetime.fromisoformat(messages[0]["timestamp"])
+            last = datetime.fromisoformat(messages[-1]["timestamp"])
+            duration = str(timedelta(seconds=max(0, int((last - first).total_seconds()))))
+        
+        return {
+            "total_messages": total_messages,
+            "user_messages": user_count,
+            "assistant_messages": assistant_count,
+            "total_characters": total_chars,
+            "average_message_length": total_chars // total_messages if total_messages else 0,
+            "conversation_duration": duration
+        }
+    
+    def _export_json(self, messages: List[Dict[str, Any]], timestamp: str, statistics: Dict[str, Any],
+                     now: datetime, indent: bool = False, compress: bool = False) -> str:
+        """Export as JSON format"""
+        filename = f"conversation_{timestamp}.json" + (".gz" if compress else "")
+        filepath = self.export_dir / filename
+        
+        export_data = {
+            "agent_id": self.agent_id,
+            "exported_at": now,  # serialized natively by orjson
+            "config": self.config,
+            "messages": messages,
+            "statistics": statistics
+        }
+        
+        with _open_export(filepath, compress, binary=True) as f:
+            f.write(json_dumps(export_data, indent=indent))
+        
+        return str(filepath)
+    
+    def _export_txt(self, messages: List[Dict[str, Any]], timestamp: str, now_str: str,
+                    compress: bool = False) -> str:
+        """Export as plain text format"""
+        filename = f"conversation_{timestamp}.txt" + (".gz" if compress else "")
+        filepath = self.export_dir / filename
+        
+        with _open_export(filepath, compress) as f:
+            f.write(f"Anthropic {self.model_config['name']} Chat Agent Conversation Export\n")
+            f.write(f"Agent ID: {self.agent_id}\n")
+            f.write(f"Model: {self.config.get('model', 'Unknown')}\n")
+            f.write(f"Exported: {now_str}\n")
+            f.write("=" * 50 + "\n\n")
+            
+            write = f.write
+            fmt_ts = _fmt_ts
+            role_upper = _ROLE_UPPER
+            for msg in _to_export_messages(messages):
+                timestamp_str = fmt_ts(msg.timestamp)
+                role = msg.role
+                write(f"[{timestamp_str}] {role_upper.get(role) or role.upper()}:\n")
+                write(f"{msg.content}\n\n")
+        
+        return str(filepath)
+    
+    def _export_markdown(self, messages: List[Dict[str, Any]], timestamp: str, now_str: str,
+                         compress: bool = False) -> str:
+        """Export as Markdown format"""
+        filename = f"conversation_{timestamp}.md" + (".gz" if compress else "")
+        filepath = self.export_dir / filename
+        
+        with _open_export(filepath, compress) as f:
+            f.write(f"# Anthropic {self.model_config['name']} Chat Agent Conversation\n\n")
+            f.write(f"**Agent ID:** {self.agent_id}  \n")
+            f.write(f"**Model:** {self.config.get('model', 'Unknown')}  \n")
+            f.write(f"**Exported:** {now_str}  \n\n")
+            
+            write = f.write
+            fmt_ts = _fmt_ts
+            role_emoji_map = _ROLE_EMOJI
+            role_title = _ROLE_TITLE
+            for msg in _to_export_messages(messages):
+                timestamp_str = fmt_ts(msg.timestamp)
+                role = msg.role
+                role_emoji = role_emoji_map.get(role, "🤖")
+                write(f"## {role_emoji} {role_title.get(role) or role.title()} - {timestamp_str}\n\n")
+                write(f"{msg.content}\n\n")
+        
+        return str(filepath)
+    
+    def _export_html(self, messages: List[Dict[str, Any]], timestamp: str, statistics: Dict[str, Any],
+                     now_str: str, compress: bool = False) -> str:
+        """Export as HTML format with styling"""
+        filename = f"conversation_{timestamp}.html" + (".gz" if compress else "")
+        filepath = self.export_dir / filename
+        
+        # Per-export escape cache; transcripts repeat greetings and boilerplate
+        import html  # deferred: only the HTML format escapes content
+        escape = functools.lru_cache(maxsize=4096)(html.escape)
+        
+        records = _to_export_messages(messages)
+        render = _render_html_message
+        
+        with _open_export(filepath, compress) as f:
+            write = f.write
+            if len(records) < _HTML_STREAM_THRESHOLD:
+                # Small transcripts: join in memory and issue a single write
+                write("".join([
+                    self._html_header(statistics, now_str),
+                    *[render(msg, escape) for msg in records],
+                    self._html_footer(now_str),
+                ]))
+            else:
+                # Large transcripts: stream so only one message is rendered in memory at a time
+                write(self._html_header(statistics, now_str))
+                for msg in records:
+                    write(render(msg, escape))
+                write(self._html_footer(now_str))
+        
+        return str(filepath)
+    
+    def _html_header(self, statistics: Dict[str, Any], exported_str: str) -> str:
+        """Render the HTML document head, header and statistics"""
+        return _HTML_HEAD.format_map({
+            'model_display': self.model_config['name'],
+            'agent_id': self.agent_id,
+            'model': self.config.get('model', 'Unknown'),
+            'exported': exported_str,
+            'temperature': self.config.get('temperature', 1.0),
+            'total_messages': statistics.get('total_messages', 0),
+            'user_messages': statistics.get('user_messages', 0),
+            'assistant_messages': statistics.get('assistant_messages', 0),
+            'total_characters': statistics.get('total_characters', 0),
+            'average_message_length': statistics.get('average_message_length', 0),
+            'conversation_duration': statistics.get('conversation_duration', 'N/A'),
+        })
+    
+    def _html_footer(self, exported_str: str) -> str:
+        """Close the HTML document"""
+        return _HTML_FOOTER.format_map({
+            'model_display': self.model_config['name'],
+            'agent_id': self.agent_id,
+            'exported': exported_str,
+        })
\ No newline at end of file
@@ -12,24 +12,95 @@ Usage Examples:
     python main.py --agent-id my-agent --export html
 """
 
+import os
 import sys
+import time
 import argparse
-import yaml
 from pathlib import Path
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Iterator, Tuple, TYPE_CHECKING
 
-try:
-    from colorama import Fore, Style, init as colorama_init
+colorama_init = None
+if sys.stdout.isatty():
+    # Colors only matter on a terminal; piped runs skip importing colorama
+    try:
+        from colorama import Fore, Style, init as colorama_init
+    except ImportError:
+        pass
+
+if colorama_init is not None:
     colorama_init(autoreset=True)
-except ImportError:
+else:
     class Fore:
         RED = GREEN = YELLOW = BLUE = MAGENTA = CYAN = WHITE = RESET = ""
     class Style:
         BRIGHT = DIM = RESET_ALL = ""
 
-from agent import ClaudeChatAgent
+if TYPE_CHECKING:
+    from agent import ClaudeChatAgent
+
 from config import AgentConfig, get_supported_models, get_model_config
+from utils import count_history_file, iter_history_file, load_config_file
+
+
+# Reading agent files: unreadable paths and malformed JSON/YAML (the JSON decoders raise
+# ValueError subclasses and load_yaml_file re-raises YAMLError as ValueError); documents of
+# the wrong shape are checked with isinstance where they are used
+_FILE_ERRORS = (OSError, ValueError)
+
+# Answers accepted at y/n prompts
+_YES = frozenset({'y', 'yes', 'true'})
+_NO = frozenset({'n', 'no', 'false'})
+
+_EXPORT_FORMATS = frozenset({'json', 'txt', 'md', 'html'})
+# Bookkeeping fields hidden from /config
+_CONFIG_HIDDEN_KEYS = frozenset({'created_at', 'updated_at'})
+
+
+@lru_cache(maxsize=32)
+def _model_display_name(model: str) -> str:
+    """Human-readable model name (memoized; model IDs are a small closed set)"""
+    return get_model_config(model).get('name', model)
+
+
+@lru_cache(maxsize=256)
+def _parse_config(path: str, mtime_ns: int) -> Dict[str, Any]:
+    """Parse a config file; the mtime in the key invalidates the entry when the file changes"""
+    return load_config_file(Path(path))
+
+
+def _load_config_cached(config_file: Path) -> Dict[str, Any]:
+    """Load an agent config, reusing the parsed result until the file is modified (treat as read-only)"""
+    return _parse_config(str(config_file), os.stat(config_file).st_mtime_ns)
+
+
+def _format_message_time(msg: Dict[str, Any], fmt: str) -> str:
+    """Format a message's local time from its epoch "ts", parsing the ISO timestamp only for old entries"""
+    ts = msg.get("ts")
+    timestamp = msg.get("timestamp")
+    try:
+        if isinstance(ts, (int, float)):
+            return time.strftime(fmt, time.localtime(ts))
+        if isinstance(timestamp, str):
+            return datetime.fromisoformat(timestamp).strftime(fmt)
+    except (OverflowError, OSError, ValueError):
+        # Out-of-range epoch or malformed ISO string in a damaged history line
+        pass
+    return "Unknown"
+
+
+def _walk_files(path: str, prefix: str = "") -> Iterator[Tuple[str, os.DirEntry]]:
+    """Yield (relative path, entry) for every file below path with a single scandir walk"""
+    with os.scandir(path) as it:
+        for entry in it:
+            rel_path = prefix + entry.name
+            # Symlinked files are listed, symlinked directories are not descended into
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_files(entry.path, rel_path + os.sep)
+            elif entry.is_file():
+                yield rel_path, entry
 
 
 def list_agents() -> List[Dict[str, Any]]:
@@ -40,44 +111,54 @@ def list_agents() -> List[Dict[str, Any]]:
     if not agents_dir.exists():
         return agents
     
-    for agent_dir in agents_dir.iterdir():
-        if agent_dir.is_dir():
-            config_file = agent_dir / "config.yaml"
-            history_file = agent_dir / "history.json"
-            
-            agent_info = {
-                "id": agent_dir.name,
-                "path": str(agent_dir),
-                "exists": True
-            }
-            
-            if config_file.exists():
-                try:
-                    with open(config_file) as f:
-                        config = yaml.safe_load(f)
-                        agent_info["model"] = config.get("model", "claude-opus-4-20250514")
-                        agent_info["created_at"] = config.get("created_at")
-                        agent_info["updated_at"] = config.get("updated_at")
-                except:
-                    pass
-            
-            if history_file.exists():
-                try:
-                    import json
-                    with open(history_file) as f:
-                        history = json.load(f)
-                        agent_info["message_count"] = len(history)
-                        agent_info["history_size"] = history_file.stat().st_size
-                except:
-                    agent_info["message_count"] = 0
-                    agent_info["history_size"] = 0
-            else:
+    with os.scandir(agents_dir) as it:
+        agent_entries = [entry for entry in it if entry.is_dir()]
+    
+    for agent_entry in agent_entries:
+        # One scandir per agent answers every exists() check and carries the stat for sizes
+        with os.scandir(agent_entry.path) as it:
+            files = {entry.name: entry for entry in it}
+        config_entry = files.get("config.json") or files.get("config.yaml")  # yaml: not yet migrated
+        history_entry = files.get("history.jsonl") or files.get("history.json")  # json: not yet migrated
+        
+        agent_info = {
+            "id": agent_entry.name,
+            "path": agent_entry.path,
+            "exists": True
+        }
+        
+        max_history_size = 1000  # AgentConfig default
+        if config_entry is not None:
+            try:
+                config = _load_config_cached(Path(config_entry.path))
+            except _FILE_ERRORS:
+                config = None
+            if isinstance(config, dict):
+                agent_info["model"] = config.get("model", "claude-opus-4-20250514")
+                agent_info["created_at"] = config.get("created_at")
+                agent_info["updated_at"] = config.get("updated_at")
+                if isinstance(config.get("max_history_size"), int):
+                    # The log is compacted lazily, so it can hold more lines than the agent keeps
+                    max_history_size = config["max_history_size"]
+        
+        if history_entry is not None:
+            try:
+                agent_info["message_count"] = count_history_file(Path(history_entry.path), max_history_size)
+                agent_info["history_size"] = history_entry.stat().st_size
+            except _FILE_ERRORS:
                 agent_info["message_count"] = 0
                 agent_info["history_size"] = 0
-            
-            agents.append(agent_info)
+        else:
+            agent_info["message_count"] = 0
+            agent_info["history_size"] = 0
+        
+        if not isinstance(agent_info.get("updated_at"), str):
+            agent_info["updated_at"] = None
+        # Pair with the sort key up front so sorting compares tuples' first items only
+        agents.append((agent_info.get("updated_at") or "", agent_info))
     
-    return sorted(agents, key=lambda x: x.get("updated_at", ""))
+    agents.sort(key=itemgetter(0))
+    return [agent_info for _, agent_info in agents]
 
 
 def show_agent_info(agent_id: str):
@@ -93,15 +174,17 @@ def show_agent_info(agent_id: str):
     print(f"{Fore.CYAN}{'='*50}{Style.RESET_ALL}")
     
     # Configuration
-    config_file = agent_dir / "config.yaml"
+    config_file = agent_dir / "config.json"
+    if not config_file.exists():
+        config_file = agent_dir / "config.yaml"  # not yet migrated
     if config_file.exists():
         try:
-            with open(config_file) as f:
-                config = yaml.safe_load(f)
+            config = _load_config_cached(config_file)
+            if not isinstance(config, dict):
+                raise ValueError(f"{config_file} does not hold a mapping")
             
             model = config.get('model', 'claude-opus-4-20250514')
-            model_config = get_model_config(model)
-            model_display = model_config.get('name', model)
+            model_display = _model_display_name(model)
             
             print(f"\n{Fore.GREEN}Configuration:")
             print(f"{Fore.WHITE}  Model: {model} ({model_display})")
@@ -111,47 +194,57 @@ def show_agent_info(agent_id: str):
             print(f"  Created: {config.get('created_at', 'Unknown')}")
             print(f"  Updated: {config.get('updated_at', 'Unknown')}")
             
-        except Exception as e:
+        except _FILE_ERRORS as e:
             print(f"{Fore.RED}Error loading config: {e}")
     
     # History
-    history_file = agent_dir / "history.json"
+    history_file = agent_dir / "history.jsonl"
+    if not history_file.exists():
+        history_file = agent_dir / "history.json"  # not yet migrated
     if history_file.exists():
         try:
-            import json
-            with open(history_file) as f:
-                history = json.load(f)
-            
-            user_msgs = len([m for m in history if m.get("role") == "user"])
-            assistant_msgs = len([m for m in history if m.get("role") == "assistant"])
-            total_chars = sum(len(m.get("content", "")) for m in history)
+            # Stream the log once, counting as we go instead of materializing it
+            total_msgs = user_msgs = assistant_msgs = total_chars = 0
+            first_msg = last_msg = None
+            for m in iter_history_file(history_file):
+                if not isinstance(m, dict):
+                    continue
+                total_msgs += 1
+                if first_msg is None:
+                    first_msg = m
+                last_msg = m
+                role = m.get("role")
+                if role == "user":
+                    user_msgs += 1
+                elif role == "assistant":
+                    assistant_msgs += 1
+                content = m.get("content")
+                if isinstance(content, str):
+                    total_chars += len(content)
             
             print(f"\n{Fore.GREEN}Conversation History:")
-            print(f"{Fore.WHITE}  Total Messages: {len(history)}")
+            print(f"{Fore.WHITE}  Total Messages: {total_msgs}")
             print(f"  User Messages: {user_msgs}")
             print(f"  Assistant Messages: {assistant_msgs}")
             print(f"  Total Characters: {total_chars:,}")
             print(f"  File Size: {history_file.stat().st_size:,} bytes")
             
-            if history:
-                first_msg = datetime.fromisoformat(history[0]["timestamp"])
-                last_msg = datetime.fromisoformat(history[-1]["timestamp"])
-                print(f"  First Message: {first_msg.strftime('%Y-%m-%d %H:%M:%S')}")
-                print(f"  Last Message: {last_msg.strftime('%Y-%m-%d %H:%M:%S')}")
+            if first_msg is not None:
+                print(f"  First Message: {_format_message_time(first_msg, '%Y-%m-%d %H:%M:%S')}")
+                print(f"  Last Message: {_format_message_time(last_msg, '%Y-%m-%d %H:%M:%S')}")
                 
-        except Exception as e:
+        except _FILE_ERRORS as e:
             print(f"{Fore.RED}Error loading history: {e}")
     else:
         print(f"\n{Fore.YELLOW}No conversation history found{Style.RESET_ALL}")
     
     # Directory structure
     print(f"\n{Fore.GREEN}Directory Structure:")
-    for item in sorted(agent_dir.rglob("*")):
-        if item.is_file():
-            size = item.stat().st_size
-            size_str = f"{size:,}" if size < 1024 else f"{size/1024:.1f}K"
-            rel_path = item.relative_to(agent_dir)
-            print(f"{Fore.WHITE}  {rel_path} ({size_str} bytes)")
+    # Sort on path components, matching the order of sorted(Path.rglob())
+    for rel_path, entry in sorted(_walk_files(str(agent_dir)), key=lambda item: item[0].split(os.sep)):
+        size = entry.stat().st_size
+        size_str = f"{size:,}" if size < 1024 else f"{size/1024:.1f}K"
+        print(f"{Fore.WHITE}  {rel_path} ({size_str} bytes)")
 
 
 def create_agent_config_interactive() -> AgentConfig:
@@ -206,26 +299,191 @@ def create_agent_config_interactive() -> AgentConfig:
     
     # Streaming
     stream_input = input(f"Enable streaming (y/n) [{'y' if config.stream else 'n'}]: ").strip().lower()
-    if stream_input in ['n', 'no', 'false']:
+    if stream_input in _NO:
         config.stream = False
-    elif stream_input in ['y', 'yes', 'true']:
+    elif stream_input in _YES:
         config.stream = True
     
     return config
 
 
-def interactive_chat(agent: ClaudeChatAgent):
+def _cmd_help(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/help - Show available commands"""
+    print(f"\n{Fore.YELLOW}Available Commands:")
+    print(f"{Fore.WHITE}/help - Show this help message")
+    print(f"/history [n] - Show last n messages (default 5)")
+    print(f"/search <term> - Search conversation history")
+    print(f"/stats - Show conversation statistics")
+    print(f"/config - Show current configuration")
+    print(f"/export <json|txt|md|html> - Export conversation")
+    print(f"/clear - Clear conversation history")
+    print(f"/files - List available files for inclusion")
+    print(f"/info - Show agent information")
+    print(f"/quit - Exit chat{Style.RESET_ALL}\n")
+    print(f"{Fore.CYAN}File Inclusion: Use {{filename}} to include file content")
+    print(f"Supported: Programming files (.py, .js, etc.), configs, docs{Style.RESET_ALL}\n")
+
+
+def _cmd_history(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/history [n] - Show the last n messages"""
+    limit = 5
+    if len(command_parts) > 1:
+        try:
+            limit = int(command_parts[1])
+        except ValueError:
+            print(f"{Fore.RED}Invalid number{Style.RESET_ALL}")
+            return
+    
+    recent_messages = agent.tail(limit)
+    if not recent_messages:
+        print(f"{Fore.YELLOW}No messages in history{Style.RESET_ALL}")
+    else:
+        print(f"\n{Fore.YELLOW}Last {len(recent_messages)} messages:")
+        for msg in recent_messages:
+            timestamp = _format_message_time(msg, "%H:%M:%S")
+            role_color = Fore.CYAN if msg["role"] == "user" else Fore.GREEN
+            content_preview = msg['content'][:100] + '...' if len(msg['content']) > 100 else msg['content']
+            print(f"{Fore.WHITE}[{timestamp}] {role_color}{msg['role']}: {content_preview}")
+    print()
+
+
+def _cmd_search(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/search <term> - Search conversation history"""
+    if len(command_parts) < 2:
+        print(f"{Fore.RED}Usage: /search <term>{Style.RESET_ALL}")
+        return
+    
+    search_term = ' '.join(command_parts[1:])
+    results = agent.search_history(search_term)
+    
+    if not results:
+        print(f"{Fore.YELLOW}No matches found for '{search_term}'{Style.RESET_ALL}")
+    else:
+        print(f"\n{Fore.YELLOW}Found {len(results)} matches for '{search_term}':")
+        for result in results:
+            msg = result["message"]
+            timestamp = _format_message_time(msg, "%H:%M:%S")
+            role_color = Fore.CYAN if msg["role"] == "user" else Fore.GREEN
+            print(f"{Fore.WHITE}[{timestamp}] {role_color}{msg['role']}: {result['preview']}")
+    print()
+
+
+def _cmd_stats(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/stats - Show conversation statistics"""
+    stats = agent.get_statistics()
+    print(f"\n{Fore.YELLOW}Conversation Statistics:")
+    print(f"{Fore.WHITE}Model: {agent.config.model} ({_model_display_name(agent.config.model)})")
+    print(f"Total Messages: {stats['total_messages']}")
+    print(f"User Messages: {stats['user_messages']}")
+    print(f"Assistant Messages: {stats['assistant_messages']}")
+    print(f"Total Characters: {stats['total_characters']:,}")
+    print(f"Average Message Length: {stats['average_message_length']:,}")
+    if stats['first_message']:
+        print(f"First Message: {stats['first_message']}")
+        print(f"Last Message: {stats['last_message']}")
+        print(f"Duration: {stats['conversation_duration']}")
+    print()
+
+
+def _cmd_config(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/config - Show current configuration"""
+    print(f"\n{Fore.YELLOW}Current Configuration:")
+    config_dict = agent.config.to_dict()
+    for key, value in config_dict.items():
+        if key not in _CONFIG_HIDDEN_KEYS:
+            if key == 'model':
+                model_name = _model_display_name(str(value))
+                print(f"{Fore.WHITE}{key}: {value} ({model_name})")
+            else:
+                print(f"{Fore.WHITE}{key}: {value}")
+    print()
+
+
+def _cmd_export(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/export <format> - Export the conversation"""
+    if len(command_parts) < 2:
+        print(f"{Fore.RED}Usage: /export <json|txt|md|html>{Style.RESET_ALL}")
+        return
+    
+    format_type = command_parts[1].lower()
+    if format_type not in _EXPORT_FORMATS:
+        print(f"{Fore.RED}Invalid format. Use: json, txt, md, or html{Style.RESET_ALL}")
+        return
+    
+    try:
+        filepath = agent.export_conversation(format_type)
+        print(f"{Fore.GREEN}Exported to: {filepath}{Style.RESET_ALL}")
+    except Exception as e:
+        print(f"{Fore.RED}Export failed: {e}{Style.RESET_ALL}")
+
+
+def _cmd_clear(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/clear - Clear conversation history after confirmation"""
+    confirm = input(f"{Fore.YELLOW}Clear conversation history? (y/N): {Style.RESET_ALL}").strip().lower()
+    if confirm in _YES:
+        agent.clear_history()
+        print(f"{Fore.GREEN}Conversation history cleared{Style.RESET_ALL}")
+
+
+def _cmd_files(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/files - List files available for inclusion"""
+    files = agent.list_files()
+    if not files:
+        print(f"{Fore.YELLOW}No supported files found for inclusion{Style.RESET_ALL}")
+    else:
+        print(f"\n{Fore.YELLOW}Available Files for Inclusion:")
+        for file_info in files[:20]:
+            print(f"{Fore.WHITE}{file_info}")
+        if len(files) > 20:
+            print(f"{Fore.YELLOW}... and {len(files) - 20} more files")
+        print(f"{Fore.CYAN}Use {{filename}} in your message to include file content{Style.RESET_ALL}\n")
+
+
+def _cmd_info(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/info - Show agent information"""
+    # Log records are buffered; write them out so the reported log size is current
+    agent.flush_logs()
+    show_agent_info(agent.agent_id)
+
+
+def _cmd_quit(agent: "ClaudeChatAgent", command_parts: List[str]) -> Optional[bool]:
+    """/quit - End the session"""
+    print(f"{Fore.GREEN}Goodbye!{Style.RESET_ALL}")
+    return True
+
+
+# Slash-command handlers; a handler returns True to end the chat session
+COMMANDS = {
+    'help': _cmd_help,
+    'history': _cmd_history,
+    'search': _cmd_search,
+    'stats': _cmd_stats,
+    'config': _cmd_config,
+    'export': _cmd_export,
+    'clear': _cmd_clear,
+    'files': _cmd_files,
+    'info': _cmd_info,
+    'quit': _cmd_quit,
+    'exit': _cmd_quit,
+    'q': _cmd_quit,
+}
+
+
+def interactive_chat(agent: "ClaudeChatAgent"):
     """Start interactive chat session"""
-    model_config = get_model_config(agent.config.model)
-    model_display = model_config['name']
+    model_display = _model_display_name(agent.config.model)
     
     print(f"\n{Fore.GREEN}Starting interactive chat with {model_display}")
     print(f"Agent: {Fore.YELLOW}{agent.agent_id}")
     print(f"{Fore.GREEN}Type '/help' for commands, '/quit' to exit{Style.RESET_ALL}\n")
     
+    # Prompts are built once; Fore/Style are empty strings when stdout is not a TTY
+    user_prompt = f"{Fore.CYAN}You: {Style.RESET_ALL}"
+    assistant_prefix = f"\n{Fore.GREEN}Assistant: {Style.RESET_ALL}"
+    
     while True:
         try:
-            user_input = input(f"{Fore.CYAN}You: {Style.RESET_ALL}").strip()
+            user_input = input(user_prompt).strip()
             
             if not user_input:
                 continue
@@ -234,138 +492,17 @@ def interactive_chat(agent: ClaudeChatAgent):
                 command_parts = user_input[1:].split()
                 command = command_parts[0].lower()
                 
-                if command == 'help':
-                    print(f"\n{Fore.YELLOW}Available Commands:")
-                    print(f"{Fore.WHITE}/help - Show this help message")
-                    print(f"/history [n] - Show last n messages (default 5)")
-                    print(f"/search <term> - Search conversation history")
-                    print(f"/stats - Show conversation statistics")
-                    print(f"/config - Show current configuration")
-                    print(f"/export <json|txt|md|html> - Export conversation")
-                    print(f"/clear - Clear conversation history")
-                    print(f"/files - List available files for inclusion")
-                    print(f"/info - Show agent information")
-                    print(f"/quit - Exit chat{Style.RESET_ALL}\n")
-                    print(f"{Fore.CYAN}File Inclusion: Use {{filename}} to include file content")
-                    print(f"Supported: Programming files (.py, .js, etc.), configs, docs{Style.RESET_ALL}\n")
-                    continue
-                
-                elif command == 'history':
-                    limit = 5
-                    if len(command_parts) > 1:
-                        try:
-                            limit = int(command_parts[1])
-                        except ValueError:
-                            print(f"{Fore.RED}Invalid number{Style.RESET_ALL}")
-                            continue
-                    
-                    recent_messages = agent.messages[-limit:]
-                    if not recent_messages:
-                        print(f"{Fore.YELLOW}No messages in history{Style.RESET_ALL}")
-                    else:
-                        print(f"\n{Fore.YELLOW}Last {len(recent_messages)} messages:")
-                        for msg in recent_messages:
-                            timestamp = datetime.fromisoformat(msg["timestamp"]).strftime("%H:%M:%S")
-                            role_color = Fore.CYAN if msg["role"] == "user" else Fore.GREEN
-                            content_preview = msg['content'][:100] + '...' if len(msg['content']) > 100 else msg['content']
-                            print(f"{Fore.WHITE}[{timestamp}] {role_color}{msg['role']}: {content_preview}")
-                    print()
-                
-                elif command == 'search':
-                    if len(command_parts) < 2:
-                        print(f"{Fore.RED}Usage: /search <term>{Style.RESET_ALL}")
-                        continue
-                    
-                    search_term = ' '.join(command_parts[1:])
-                    results = agent.search_history(search_term)
-                    
-                    if not results:
-                        print(f"{Fore.YELLOW}No matches found for '{search_term}'{Style.RESET_ALL}")
-                    else:
-                        print(f"\n{Fore.YELLOW}Found {len(results)} matches for '{search_term}':")
-                        for result in results:
-                            msg = result["message"]
-                            timestamp = datetime.fromisoformat(msg["timestamp"]).strftime("%H:%M:%S")
-                            role_color = Fore.CYAN if msg["role"] == "user" else Fore.GREEN
-                            print(f"{Fore.WHITE}[{timestamp}] {role_color}{msg['role']}: {result['preview']}")
-                    print()
-                
-                elif command == 'stats':
-                    stats = agent.get_statistics()
-                    print(f"\n{Fore.YELLOW}Conversation Statistics:")
-                    print(f"{Fore.WHITE}Model: {agent.config.model} ({model_display})")
-                    print(f"Total Messages: {stats['total_messages']}")
-                    print(f"User Messages: {stats['user_messages']}")
-                    print(f"Assistant Messages: {stats['assistant_messages']}")
-                    print(f"Total Characters: {stats['total_characters']:,}")
-                    print(f"Average Message Length: {stats['average_message_length']:,}")
-                    if stats['first_message']:
-                        print(f"First Message: {stats['first_message']}")
-                        print(f"Last Message: {stats['last_message']}")
-                        print(f"Duration: {stats['conversation_duration']}")
-                    print()
-                
-                elif command == 'config':
-                    print(f"\n{Fore.YELLOW}Current Configuration:")
-                    config_dict = agent.config.to_dict()
-                    for key, value in config_dict.items():
-                        if key not in ['created_at', 'updated_at']:
-                            if key == 'model':
-                                model_name = get_model_config(str(value)).get('name', value)
-                                print(f"{Fore.WHITE}{key}: {value} ({model_name})")
-                            else:
-                                print(f"{Fore.WHITE}{key}: {value}")
-                    print()
-                
-                elif command == 'export':
-                    if len(command_parts) < 2:
-                        print(f"{Fore.RED}Usage: /export <json|txt|md|html>{Style.RESET_ALL}")
-                        continue
-                    
-                    format_type = command_parts[1].lower()
-                    if format_type not in ['json', 'txt', 'md', 'html']:
-                        print(f"{Fore.RED}Invalid format. Use: json, txt, md, or html{Style.RESET_ALL}")
-                        continue
-                    
-                    try:
-                        filepath = agent.export_conversation(format_type)
-                        print(f"{Fore.GREEN}Exported to: {filepath}{Style.RESET_ALL}")
-                    except Exception as e:
-                        print(f"{Fore.RED}Export failed: {e}{Style.RESET_ALL}")
-                
-                elif command == 'clear':
-                    confirm = input(f"{Fore.YELLOW}Clear conversation history? (y/N): {Style.RESET_ALL}").strip().lower()
-                    if confirm in ['y', 'yes']:
-                        agent.clear_history()
-                        print(f"{Fore.GREEN}Conversation history cleared{Style.RESET_ALL}")
-                
-                elif command == 'files':
-                    files = agent.list_files()
-                    if not files:
-                        print(f"{Fore.YELLOW}No supported files found for inclusion{Style.RESET_ALL}")
-                    else:
-                        print(f"\n{Fore.YELLOW}Available Files for Inclusion:")
-                        for file_info in files[:20]:
-                            print(f"{Fore.WHITE}{file_info}")
-                        if len(files) > 20:
-                            print(f"{Fore.YELLOW}... and {len(files) - 20} more files")
-                        print(f"{Fore.CYAN}Use {{filename}} in your message to include file content{Style.RESET_ALL}\n")
-                
-                elif command == 'info':
-                    show_agent_info(agent.agent_id)
-                
-                elif command in ['quit', 'exit', 'q']:
-                    print(f"{Fore.GREEN}Goodbye!{Style.RESET_ALL}")
-                    break
-                
-                else:
+                handler = COMMANDS.get(command)
+                if handler is None:
                     print(f"{Fore.RED}Unknown command: {command}{Style.RESET_ALL}")
                     print(f"{Fore.YELLOW}Type '/help' for available commands{Style.RESET_ALL}")
+                elif handler(agent, command_parts):
+                    break
                 
                 continue
             
             # Regular message - send to API
-            print(f"\n{Fore.GREEN}Assistant: {Style.RESET_ALL}", end="", flush=True)
+            print(assistant_prefix, end="", flush=True)
             
             for chunk in agent.call_api(user_input):
                 if isinstance(chunk, str):
@@ -395,7 +532,7 @@ Examples:
     )
     
     parser.add_argument("--agent-id", help="Agent ID for chat session")
-    parser.add_argument("--model", choices=list(get_supported_models().keys()), 
+    parser.add_argument("--model", metavar="MODEL",
                        help="Model to use (default: claude-opus-4-20250514)")
     parser.add_argument("--list", action="store_true", help="List all available agents")
     parser.add_argument("--info", metavar="ID", help="Show detailed info for an agent")
@@ -404,6 +541,8 @@ Examples:
     parser.add_argument("--no-stream", action="store_true", help="Disable streaming")
     parser.add_argument("--export", choices=["json", "txt", "md", "html"], 
                        help="Export conversation in specified format")
+    parser.add_argument("--pretty", action="store_true", help="Pretty-print JSON exports (default: compact)")
+    parser.add_argument("--compress", action="store_true", help="Gzip-compress the exported file (.gz)")
     
     args = parser.parse_args()
     
@@ -414,22 +553,27 @@ Examples:
             print(f"{Fore.YELLOW}No agents found{Style.RESET_ALL}")
             return
         
-        print(f"\n{Fore.CYAN}Available Agents:{Style.RESET_ALL}")
-        print(f"{Fore.WHITE}{'ID':<25} {'Model':<35} {'Messages':<10} {'Last Updated':<20}")
-        print("-" * 90)
+        # Build the whole table and write it once rather than one print per agent
+        rows = [
+            f"\n{Fore.CYAN}Available Agents:{Style.RESET_ALL}",
+            f"{Fore.WHITE}{'ID':<25} {'Model':<35} {'Messages':<10} {'Last Updated':<20}",
+            "-" * 90,
+        ]
         
         for agent in agents:
-            updated = agent.get("updated_at", "Unknown")
+            updated = agent.get("updated_at") or "Unknown"
             if updated != "Unknown":
                 try:
                     updated = datetime.fromisoformat(updated).strftime("%Y-%m-%d %H:%M")
-                except:
+                except (TypeError, ValueError):
                     pass
             
             model = agent.get('model', 'claude-opus-4-20250514')
-            model_display = get_model_config(model).get('name', model)
-            print(f"{agent['id']:<25} {model_display:<35} {agent.get('message_count', 0):<10} {updated:<20}")
+            model_display = _model_display_name(model)
+            rows.append(f"{agent['id']:<25} {model_display:<35} {agent.get('message_count', 0):<10} {updated:<20}")
         
+        rows.append("")
+        sys.stdout.write("\n".join(rows))
         return
     
     # Handle info command
@@ -443,6 +587,16 @@ Examples:
         print(f"\n{Fore.RED}Error: --agent-id is required{Style.RESET_ALL}")
         return
     
+    # Validated here rather than via choices= so --help/--list skip the model registry
+    if args.model is not None:
+        supported_models = list(get_supported_models().keys())
+        if args.model not in supported_models:
+            parser.error(f"argument --model: invalid choice: '{args.model}' "
+                         f"(choose from {', '.join(supported_models)})")
+    
+    # Deferred: the agent pulls in the HTTP stack, which --help/--list/--info never need
+    from agent import ClaudeChatAgent
+    
     try:
         # Create agent
         model = args.model or "claude-opus-4-20250514"
@@ -458,7 +612,7 @@ Examples:
         
         # Handle export command
         if args.export:
-            filepath = agent.export_conversation(args.export)
+            filepath = agent.export_conversation(args.export, indent=args.pretty, compress=args.compress)
             print(f"{Fore.GREEN}Exported to: {filepath}{Style.RESET_ALL}")
             return
         
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+"""
+Optional compiled speedups for Claude Opus 4/4.1 Chat Agent
+
+Set ENABLE_SPEEDUPS=1 to compile export.py with Cython in pure-Python mode
+(typed via export.pxd). Without it, every module runs as plain Python.
+
+    ENABLE_SPEEDUPS=1 python setup.py build_ext --inplace
+"""
+
+import os
+from setuptools import setup
+
+ext_modules = []
+if os.environ.get("ENABLE_SPEEDUPS") == "1":
+    from Cython.Build import cythonize
+    ext_modules = cythonize(["export.py"], language_level=3)
+
+setup(
+    name="claude-opus-cli-agent",
+    ext_modules=ext_modules,
+)
@@ -0,0 +1,484 @@
+"""Tests for the chat agent's history log and HTTP transports"""
+
+import asyncio
+import copy
+import gc
+import json
+import os
+import tempfile
+import threading
+import unittest
+import warnings
+from unittest import mock
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from aiohttp import web
+except ImportError:
+    web = None
+
+from agent import API_ROLES, ClaudeChatAgent
+from utils import load_jsonl_file, save_json_file
+
+
+def _sse(text: str) -> bytes:
+    event = {"type": "content_block_delta", "delta": {"text": text}}
+    return f"data: {json.dumps(event)}\n\n".encode()
+
+
+@unittest.skipIf(web is None, "requires aiohttp")
+class AsyncSessionTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        env = mock.patch.dict(os.environ, {"ANTHROPIC_API_KEY": "sk-test-123456"})
+        env.start()
+        self.addCleanup(env.stop)
+        
+        self.peers = []
+        
+        async def handler(request):
+            # Client address and port identify the TCP connection the request arrived on
+            self.peers.append(request.transport.get_extra_info("peername"))
+            response = web.StreamResponse()
+            await response.prepare(request)
+            await response.write(_sse("pong"))
+            await response.write(b'data: {"type":"message_stop"}\n\n')
+            return response
+        
+        app = web.Application()
+        app.router.add_post("/v1/messages", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        
+        self.agent = ClaudeChatAgent("async-test")
+        self.agent.api_url = f"http://127.0.0.1:{port}/v1/messages"
+    
+    async def asyncTearDown(self):
+        await self.agent.aclose()
+        await self.runner.cleanup()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+    
+    async def test_session_and_connection_reused_across_calls(self):
+        first = [chunk async for chunk in self.agent.call_api_async("ping 1")]
+        session = self.agent._async_session
+        second = [chunk async for chunk in self.agent.call_api_async("ping 2")]
+        
+        self.assertEqual(first, ["pong"])
+        self.assertEqual(second, ["pong"])
+        self.assertIs(self.agent._async_session, session)
+        self.assertEqual(len(self.peers), 2)
+        self.assertEqual(self.peers[0], self.peers[1])
+    
+    async def test_file_inclusions_expanded_off_the_loop(self):
+        threads = []
+        
+        def include(content, base_dir, logger):
+            threads.append(threading.get_ident())
+            return content
+        
+        with mock.patch("agent.process_file_inclusions", side_effect=include):
+            [chunk async for chunk in self.agent.call_api_async("see {notes.md}")]
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], threading.get_ident())
+    
+    async def test_async_with_closes_the_session(self):
+        async with self.agent as agent:
+            [chunk async for chunk in agent.call_api_async("ping")]
+            session = agent._async_session
+        self.assertTrue(session.closed)
+    
+    async def test_aclose_closes_the_session(self):
+        [chunk async for chunk in self.agent.call_api_async("ping")]
+        session = self.agent._async_session
+        await self.agent.aclose()
+        self.assertTrue(session.closed)
+        self.assertIsNone(self.agent._async_session)
+
+
+@unittest.skipIf(web is None, "requires aiohttp")
+class AsyncLoopChangeTests(unittest.TestCase):
+    """One agent driven by a fresh asyncio.run per turn, as a script calling call_api_async might"""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        env = mock.patch.dict(os.environ, {"ANTHROPIC_API_KEY": "sk-test-123456"})
+        env.start()
+        self.addCleanup(env.stop)
+        
+        # The server needs a loop that outlives each asyncio.run, so it gets a thread of its own
+        self._server_loop = asyncio.new_event_loop()
+        self._server_thread = threading.Thread(target=self._server_loop.run_forever, daemon=True)
+        self._server_thread.start()
+        port = asyncio.run_coroutine_threadsafe(self._start_server(), self._server_loop).result(10)
+        
+        self.agent = ClaudeChatAgent("loop-test")
+        self.agent.api_url = f"http://127.0.0.1:{port}/v1/messages"
+    
+    async def _start_server(self):
+        async def handler(request):
+            response = web.StreamResponse()
+            await response.prepare(request)
+            await response.write(_sse("pong"))
+            return response
+        
+        app = web.Application()
+        app.router.add_post("/v1/messages", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+    
+    def tearDown(self):
+        self.agent.close()
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self._server_loop).result(10)
+        self._server_loop.call_soon_threadsafe(self._server_loop.stop)
+        self._server_thread.join(10)
+        self._server_loop.close()
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+    
+    async def _turn(self, message):
+        return [chunk async for chunk in self.agent.call_api_async(message)]
+    
+    async def _closed_turn(self, message):
+        try:
+            return await self._turn(message), self.agent._async_session
+        finally:
+            await self.agent.aclose()
+    
+    def test_no_resource_warning_across_asyncio_run_calls(self):
+        with warnings.catch_warnings(record=True) as caught, \
+                self.assertNoLogs("asyncio", level="ERROR"):
+            warnings.simplefilter("always")
+            reply, first = asyncio.run(self._closed_turn("ping 1"))
+            self.assertEqual(reply, ["pong"])
+            reply, second = asyncio.run(self._closed_turn("ping 2"))
+            self.assertEqual(reply, ["pong"])
+            gc.collect()
+        
+        self.assertTrue(first.closed)
+        self.assertTrue(second.closed)
+        self.assertIsNot(first, second)
+        leaks = [w for w in caught if issubclass(w.category, ResourceWarning)]
+        self.assertEqual(leaks, [])
+    
+    def test_loop_change_without_aclose_is_logged(self):
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(self._turn("ping 1"))
+            first = self.agent._async_session
+            with self.assertLogs(self.agent.logger, level="WARNING") as logs:
+                self.assertEqual(asyncio.run(self._closed_turn("ping 2"))[0], ["pong"])
+            self.assertIn("Event loop changed without aclose()", logs.output[0])
+            loop.run_until_complete(first.close())
+        finally:
+            loop.close()
+    
+    def test_aclose_releases_session_on_a_live_loop(self):
+        loop = asyncio.new_event_loop()
+        try:
+            self.assertEqual(loop.run_until_complete(self._turn("ping")), ["pong"])
+            session = self.agent._async_session
+            loop.run_until_complete(self.agent.aclose())
+            self.assertTrue(session.closed)
+            self.assertIsNone(self.agent._async_session)
+        finally:
+            loop.close()
+
+
+class _AgentDirTestCase(unittest.TestCase):
+    """Run each test in a fresh working directory holding agents/history-test"""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        env = mock.patch.dict(os.environ, {"ANTHROPIC_API_KEY": "sk-test-123456"})
+        env.start()
+        self.addCleanup(env.stop)
+        self.base_dir = Path("agents/history-test")
+        self.base_dir.mkdir(parents=True)
+        self.log = self.base_dir / "history.jsonl"
+    
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+    
+    def _agent(self):
+        agent = ClaudeChatAgent("history-test")
+        self.addCleanup(agent.close)
+        return agent
+
+
+class HistoryTests(_AgentDirTestCase):
+    def test_legacy_history_json_is_migrated(self):
+        legacy = [
+            {"role": "user", "content": "hi", "timestamp": "2024-01-02T03:04:05"},
+            {"role": "assistant", "content": "hello", "timestamp": "2024-01-02T03:04:06"},
+        ]
+        save_json_file(legacy, self.base_dir / "history.json")
+        
+        agent = self._agent()
+        
+        self.assertFalse((self.base_dir / "history.json").exists())
+        self.assertTrue((self.base_dir / "history.json.migrated").exists())
+        self.assertEqual([m["content"] for m in load_jsonl_file(self.log)], ["hi", "hello"])
+        self.assertEqual([m["content"] for m in agent.messages], ["hi", "hello"])
+        self.assertEqual(agent.messages[0]["ts"], datetime(2024, 1, 2, 3, 4, 5).timestamp())
+    
+    def test_malformed_legacy_entries_are_skipped(self):
+        save_json_file([
+            {"role": "user", "content": "kept", "timestamp": "2024-01-02T03:04:05"},
+            {"role": "user", "content": "bad time", "timestamp": "yesterday"},
+            {"role": "user", "content": "no time"},
+            "not a message",
+        ], self.base_dir / "history.json")
+        
+        agent = self._agent()
+        
+        self.assertEqual([m["content"] for m in agent.messages], ["kept"])
+    
+    def test_torn_tail_is_repaired_on_next_append(self):
+        self.log.write_bytes(b'{"role": "user", "content": "one", "ts": 1.0}\n{"role": "assis')
+        
+        agent = self._agent()
+        self.assertEqual([m["content"] for m in agent.messages], ["one"])
+        agent.add_message("user", "two")
+        
+        self.assertEqual([m["content"] for m in load_jsonl_file(self.log)], ["one", "two"])
+        self.assertTrue(self.log.read_bytes().endswith(b"\n"))
+    
+    def test_malformed_lines_count_towards_compaction(self):
+        self.log.write_bytes(b'{"role": "user", "content": "one", "ts": 1.0}\nnot json\n"not a message"\n')
+        
+        agent = self._agent()
+        
+        self.assertEqual([m["content"] for m in agent.messages], ["one"])
+        self.assertEqual(agent._history_lines, 3)
+    
+    def test_failed_write_is_retried_on_next_save(self):
+        agent = self._agent()
+        with mock.patch("agent.append_jsonl_file", side_effect=OSError("disk full")):
+            agent.add_message("user", "one")
+        agent.add_message("user", "two")
+        
+        self.assertEqual([m["content"] for m in load_jsonl_file(self.log)], ["one", "two"])
+    
+    def test_log_compacted_past_one_and_a_quarter_times_the_limit(self):
+        agent = self._agent()
+        agent.config.max_history_size = 4
+        
+        line_counts = []
+        for n in range(6):
+            agent.add_message("user", f"m{n}")
+            line_counts.append(len(self.log.read_bytes().splitlines()))
+        
+        # Appends run up to 5 lines (1.25 x 4); the sixth write rewrites the log to the last 4
+        self.assertEqual(line_counts, [1, 2, 3, 4, 5, 4])
+        self.assertEqual([m["content"] for m in load_jsonl_file(self.log)], ["m2", "m3", "m4", "m5"])
+    
+    def test_truncation_keeps_views_in_step(self):
+        agent = self._agent()
+        agent.config.max_history_size = 3
+        for n, role in enumerate(["user", "system", "assistant", "user", "system", "assistant"]):
+            agent.add_message(role, f"M{n}")
+        
+        self.assertEqual([m["content"] for m in agent.messages], ["M3", "M4", "M5"])
+        self.assertEqual(list(agent._content_lower), ["m3", "m4", "m5"])
+        self.assertEqual(list(agent._api_messages),
+                         [agent._to_api_message(m) for m in agent.messages if m["role"] in API_ROLES])
+
+
+class LoggingTests(_AgentDirTestCase):
+    def test_close_flushes_buffered_log_records(self):
+        agent = self._agent()
+        log_file = next((self.base_dir / "logs").glob("*.log"))
+        self.assertEqual(log_file.stat().st_size, 0)
+        
+        agent.close()
+        
+        self.assertIn("Initialized Claude Chat Agent", log_file.read_text(encoding="utf-8"))
+
+
+class ConfigTests(_AgentDirTestCase):
+    def test_config_with_dropped_message_count_loads(self):
+        config_file = self.base_dir / "config.json"
+        save_json_file({"model": "claude-opus-4-20250514", "temperature": 0.3, "message_count": 12}, config_file)
+        
+        agent = self._agent()
+        
+        self.assertEqual(agent.config.temperature, 0.3)
+    
+    def test_unreadable_config_is_not_overwritten(self):
+        config_file = self.base_dir / "config.json"
+        config_file.write_bytes(b'{"temperature": 0.3, "model": ')
+        
+        agent = self._agent()
+        
+        self.assertEqual(agent.config.temperature, 1.0)
+        self.assertEqual(config_file.read_bytes(), b'{"temperature": 0.3, "model": ')
+
+
+class RetryTests(_AgentDirTestCase):
+    def _response(self, status):
+        return mock.Mock(status_code=status)
+    
+    def test_retryable_status_backs_off_then_succeeds(self):
+        agent = self._agent()
+        ok = self._response(200)
+        with mock.patch.object(agent._session, "post", side_effect=[self._response(429), self._response(503), ok]), \
+                mock.patch("agent.time.sleep") as sleep:
+            self.assertIs(agent._make_api_request({"stream": False}), ok)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [1, 2])
+    
+    def test_invalid_key_is_not_retried(self):
+        agent = self._agent()
+        with mock.patch.object(agent._session, "post", return_value=self._response(401)) as post:
+            with self.assertRaisesRegex(ValueError, "Invalid API key"):
+                agent._make_api_request({"stream": False})
+        self.assertEqual(post.call_count, 1)
+
+
+class _ChunkedResponse:
+    """Stand-in for a streamed requests.Response that yields fixed byte chunks"""
+    
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+    
+    def iter_content(self, chunk_size):
+        return iter(self.chunks)
+    
+    def close(self):
+        self.closed = True
+
+
+def _split_every(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class StreamParsingTests(_AgentDirTestCase):
+    STREAM = (
+        'event: message_start\r\n'
+        'data: {"type": "message_start", "message": {"usage": {"input_tokens": 12, "output_tokens": 1}}}\r\n'
+        '\r\n'
+        'event: ping\r\n'
+        'data: {"type": "ping"}\r\n'
+        '\r\n'
+        'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "Grüße, "}}\r\n'
+        '\r\n'
+        'data: {"type": "content_block_delta", "delta": {"type": "text_delta", "text": "世界 🌍"}}\r\n'
+        '\r\n'
+        'data: {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 7}}\r\n'
+        '\r\n'
+        'data: {"type": "message_stop"}\r\n'
+        '\r\n'
+    ).encode()
+    
+    def test_split_keeps_partial_line_and_strips_crlf(self):
+        payloads, rest = ClaudeChatAgent._split_sse_data(b'event: x\r\ndata: {"a": 1}\r\ndata: {"b"')
+        self.assertEqual(payloads, [b'{"a": 1}'])
+        self.assertEqual(rest, b'data: {"b"')
+        
+        payloads, rest = ClaudeChatAgent._split_sse_data(rest + b': 2}\n\n')
+        self.assertEqual(payloads, [b'{"b": 2}'])
+        self.assertEqual(rest, b"")
+    
+    def test_decode_returns_text_delta_only(self):
+        agent = self._agent()
+        self.assertEqual(agent._decode_stream_event(
+            b'{"type": "content_block_delta", "delta": {"text": "hi"}}'), "hi")
+        self.assertEqual(agent._decode_stream_event(b'{"type": "ping"}'), "")
+        self.assertEqual(agent._decode_stream_event(b"[DONE]"), "")
+    
+    def test_decode_accumulates_usage(self):
+        agent = self._agent()
+        agent._decode_stream_event(b'{"type": "message_start", "message": {"usage": {"input_tokens": 3}}}')
+        agent._decode_stream_event(b'{"type": "message_delta", "usage": {"output_tokens": 9}}')
+        self.assertEqual(agent.last_usage, {"input_tokens": 3, "output_tokens": 9})
+    
+    def test_stream_parsed_across_any_chunk_boundaries(self):
+        expected = "Grüße, 世界 🌍"
+        # Sizes 1-7 split lines, CRLF pairs and multibyte UTF-8 characters at every offset
+        for size in (*range(1, 8), 64, len(self.STREAM)):
+            with self.subTest(size=size):
+                agent = self._agent()
+                response = _ChunkedResponse(_split_every(self.STREAM, size))
+                
+                text = "".join(agent._parse_streaming_response(response))
+                
+                self.assertEqual(text, expected)
+                self.assertTrue(response.closed)
+                self.assertEqual(agent.messages[-1]["content"], expected)
+                self.assertEqual(agent.last_usage, {"input_tokens": 12, "output_tokens": 7})
+
+
+class StatisticsTests(_AgentDirTestCase):
+    def test_counts_roles_and_characters(self):
+        agent = self._agent()
+        for role, content in [("user", "hello"), ("system", "note"), ("assistant", "hi there"), ("user", "bye")]:
+            agent.add_message(role, content, flush=False)
+        agent.messages[0]["ts"] = 1000.0
+        agent.messages[-1]["ts"] = 1095.0
+        
+        stats = agent.get_statistics()
+        
+        self.assertEqual(stats["total_messages"], 4)
+        self.assertEqual(stats["user_messages"], 2)
+        self.assertEqual(stats["assistant_messages"], 1)
+        self.assertEqual(stats["total_characters"], 20)
+        self.assertEqual(stats["average_message_length"], 5)
+        self.assertEqual(stats["conversation_duration"], "0:01:35")
+    
+    def test_empty_history(self):
+        stats = self._agent().get_statistics()
+        self.assertEqual(stats["total_messages"], 0)
+        self.assertIsNone(stats["conversation_duration"])
+
+
+class PayloadTests(_AgentDirTestCase):
+    def _cache_marks(self, messages):
+        return [(i, j) for i, m in enumerate(messages)
+                for j, block in enumerate(m["content"]) if "cache_control" in block]
+    
+    def test_cache_control_on_copy_of_last_assistant_block(self):
+        agent = self._agent()
+        for role, content in [("user", "q1"), ("assistant", "a1"), ("user", "q2"), ("assistant", "a2")]:
+            agent.add_message(role, content, flush=False)
+        before = copy.deepcopy(list(agent._api_messages))
+        
+        first = agent._build_api_payload("q3")
+        second = agent._build_api_payload("q4")
+        
+        for payload in (first, second):
+            # Only the final assistant turn is marked; the new user message follows it
+            self.assertEqual(self._cache_marks(payload["messages"]), [(3, 0)])
+            self.assertEqual(payload["messages"][3]["content"][0],
+                             {"type": "text", "text": "a2", "cache_control": {"type": "ephemeral"}})
+            self.assertIsNot(payload["messages"][3], agent._api_messages[3])
+            self.assertEqual(payload["system"], [{
+                "type": "text",
+                "text": agent.config.system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }])
+        self.assertEqual(second["messages"][-1]["content"], [{"type": "text", "text": "q4"}])
+        self.assertEqual(list(agent._api_messages), before)
+    
+    def test_no_cache_mark_without_assistant_turn(self):
+        agent = self._agent()
+        payload = agent._build_api_payload("first question")
+        self.assertEqual(self._cache_marks(payload["messages"]), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
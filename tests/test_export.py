@@ -0,0 +1,58 @@
+"""Tests for conversation export"""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from types import MappingProxyType
+
+from config import get_model_config
+from export import ConversationExporter
+
+
+MESSAGES = [
+    {"role": "user", "content": "Hello <b>there</b>", "timestamp": "2025-01-01T10:00:00"},
+    {"role": "assistant", "content": "Hi!\n```\ncode\n```", "timestamp": "2025-01-01T10:00:05"},
+]
+
+
+class ExportTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.export_dir = Path(self._tmp.name)
+        self.exporter = ConversationExporter(
+            "test-agent", self.export_dir, {"model": "claude-opus-4-20250514"}
+        )
+    
+    def tearDown(self):
+        self._tmp.cleanup()
+    
+    def test_model_config_is_read_only_mapping(self):
+        # Model configs are shared MappingProxyType instances; exports must accept them
+        self.assertIsInstance(get_model_config("claude-opus-4-20250514"), MappingProxyType)
+        self.assertEqual(self.exporter.model_config["name"], "Claude Opus 4")
+    
+    def test_every_format_exports_with_mappingproxy_config(self):
+        for format_type in ("json", "txt", "md", "html"):
+            with self.subTest(format_type=format_type):
+                filepath = self.exporter.export(MESSAGES, format_type)
+                content = (self.export_dir / filepath).read_text(encoding="utf-8")
+                self.assertTrue(content)
+                if format_type != "json":
+                    self.assertIn("Claude Opus 4", content)
+    
+    def test_json_export_round_trips_messages(self):
+        filepath = self.exporter.export(MESSAGES, "json")
+        data = json.loads((self.export_dir / filepath).read_text(encoding="utf-8"))
+        self.assertEqual([m["content"] for m in data["messages"]],
+                         [m["content"] for m in MESSAGES])
+    
+    def test_html_export_escapes_content(self):
+        filepath = self.exporter.export(MESSAGES, "html")
+        content = (self.export_dir / filepath).read_text(encoding="utf-8")
+        self.assertIn("&lt;b&gt;there&lt;/b&gt;", content)
+        self.assertNotIn("<b>there</b>", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
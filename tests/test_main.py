@@ -0,0 +1,20 @@
+"""Tests for CLI helpers"""
+
+import unittest
+
+from main import _format_message_time
+
+
+class MessageTimeTests(unittest.TestCase):
+    def test_damaged_timestamps_are_unknown(self):
+        for msg in ({"ts": 1e20}, {"ts": float("nan")}, {"timestamp": "yesterday"}, {}):
+            with self.subTest(msg=msg):
+                self.assertEqual(_format_message_time(msg, "%H:%M:%S"), "Unknown")
+    
+    def test_iso_timestamp_of_old_entries(self):
+        msg = {"timestamp": "2024-01-02T03:04:05"}
+        self.assertEqual(_format_message_time(msg, "%H:%M:%S"), "03:04:05")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+"""Build the optional Cython speedups (ENABLE_SPEEDUPS=1) and exercise the compiled exporter"""
+
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules the compiled export.py needs next to it
+SOURCES = ("setup.py", "export.py", "export.pxd", "config.py", "utils.py")
+
+EXPORT_ALL_FORMATS = """
+import sys
+from pathlib import Path
+import export
+
+assert export.__file__.endswith(('.so', '.pyd')), export.__file__
+exporter = export.ConversationExporter('agent', Path('.'), {'model': 'claude-opus-4-20250514'})
+messages = [{'role': 'user', 'content': 'hi <b>', 'timestamp': '2025-01-01T10:00:00'}]
+for format_type in ('json', 'txt', 'md', 'html'):
+    exporter.export(messages, format_type)
+"""
+
+
+def _have_compiler() -> bool:
+    return any(shutil.which(cc) for cc in ("cc", "gcc", "clang", "cl"))
+
+
+@unittest.skipUnless(importlib.util.find_spec("Cython") and _have_compiler(),
+                     "requires Cython and a C compiler")
+class SpeedupsBuildTests(unittest.TestCase):
+    def test_compiled_export_renders_every_format(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in SOURCES:
+                shutil.copy(ROOT / name, tmp)
+            
+            build = subprocess.run(
+                [sys.executable, "setup.py", "build_ext", "--inplace"],
+                cwd=tmp, env=dict(os.environ, ENABLE_SPEEDUPS="1"),
+                capture_output=True, text=True
+            )
+            self.assertEqual(build.returncode, 0, build.stderr)
+            
+            run = subprocess.run([sys.executable, "-c", EXPORT_ALL_FORMATS],
+                                 cwd=tmp, capture_output=True, text=True)
+            self.assertEqual(run.returncode, 0, run.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,209 @@
+"""Tests for utility helpers"""
+
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+from config import is_supported_ext
+from utils import (
+    _IncludeCache, _include_cache, _MMAP_READ_THRESHOLD, append_jsonl_file, count_history_file, get_api_key, list_available_files, load_json_file,
+    load_jsonl_file, process_file_inclusions, save_json_file
+)
+
+
+class _ChdirTestCase(unittest.TestCase):
+    """Run each test inside a fresh temporary working directory"""
+    
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._cwd = os.getcwd()
+        os.chdir(self._tmp.name)
+        self.base_dir = Path("agent")
+        (self.base_dir / "uploads").mkdir(parents=True)
+        self.logger = logging.getLogger("test_utils")
+        self.logger.addHandler(logging.NullHandler())
+        self.logger.propagate = False
+    
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+
+class SupportedExtensionTests(unittest.TestCase):
+    def test_dotfiles_have_no_extension(self):
+        # Matches Path.suffix: the leading dot of a dotfile is not an extension
+        for name in (".env", ".gitignore", ".babelrc", "config/.env"):
+            with self.subTest(name=name):
+                self.assertFalse(is_supported_ext(name))
+    
+    def test_regular_extensions(self):
+        for name in ("main.py", "README.MD", "src/app.js", ".hidden.py"):
+            with self.subTest(name=name):
+                self.assertTrue(is_supported_ext(name))
+        self.assertFalse(is_supported_ext("Makefile"))
+
+
+class FileInclusionTests(_ChdirTestCase):
+    def test_dotfile_is_not_inlined(self):
+        Path(".env").write_text("ANTHROPIC_API_KEY=secret\n")
+        result = process_file_inclusions("see {.env}", self.base_dir, self.logger)
+        self.assertEqual(result, "see [WARNING: Unsupported file type .env]")
+        self.assertNotIn("secret", result)
+
+    def test_supported_file_is_inlined(self):
+        Path("notes.md").write_text("hello\n")
+        result = process_file_inclusions("{notes.md}", self.base_dir, self.logger)
+        self.assertEqual(result, "// File: notes.md (.md)\nhello\n")
+    
+    def test_missing_file(self):
+        result = process_file_inclusions("{absent.md}", self.base_dir, self.logger)
+        self.assertEqual(result, "[ERROR: File absent.md not found]")
+    
+    def test_file_created_after_a_miss_is_found(self):
+        self.assertEqual(process_file_inclusions("{notes.md}", self.base_dir, self.logger),
+                         "[ERROR: File notes.md not found]")
+        Path("notes.md").write_text("now here\n")
+        self.assertEqual(process_file_inclusions("{notes.md}", self.base_dir, self.logger),
+                         "// File: notes.md (.md)\nnow here\n")
+    
+    def test_new_upload_listed_immediately(self):
+        self.assertEqual(list_available_files(self.base_dir), [])
+        (self.base_dir / "uploads" / "data.csv").write_text("a,b\n")
+        self.assertIn("agent/uploads/data.csv (4 bytes) [.csv]", list_available_files(self.base_dir))
+    
+    def test_symlinked_files_listed_but_linked_dirs_not_walked(self):
+        Path("target").mkdir()
+        Path("target/notes.md").write_text("notes")
+        uploads = self.base_dir / "uploads"
+        try:
+            os.symlink(os.path.abspath("target/notes.md"), uploads / "linked.md")
+            os.symlink(os.path.abspath("target"), uploads / "linked_dir", target_is_directory=True)
+        except (OSError, NotImplementedError):
+            self.skipTest("symlinks not supported")
+        
+        listing = list_available_files(self.base_dir)
+        
+        self.assertTrue(any("linked.md (5 bytes)" in line for line in listing), listing)
+        self.assertFalse(any("linked_dir" in line for line in listing), listing)
+
+
+class ApiKeyTests(_ChdirTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.dict(os.environ)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        os.environ.pop("ANTHROPIC_API_KEY", None)
+        self.secrets_file = self.base_dir / "secrets.json"
+    
+    def _prompt(self, key="sk-test-123456"):
+        with mock.patch("builtins.input", return_value=key), mock.patch("builtins.print"):
+            return get_api_key(self.base_dir, "Claude Opus 4")
+    
+    def test_prompted_key_is_saved_and_gitignored(self):
+        self.assertEqual(self._prompt(), "sk-test-123456")
+        self.assertIn(b"secrets.json", Path(".gitignore").read_bytes())
+        secrets = load_json_file(self.secrets_file)
+        self.assertEqual(secrets["keys"]["default"], "sk-test-123456")
+    
+    def test_key_saved_even_if_gitignore_cannot_be_written(self):
+        os.mkdir(".gitignore")  # appending to it fails
+        self.assertEqual(self._prompt(), "sk-test-123456")
+        secrets = load_json_file(self.secrets_file)
+        self.assertEqual(secrets["keys"]["default"], "sk-test-123456")
+    
+    def test_reading_a_stored_key_writes_nothing(self):
+        save_json_file({"keys": {"default": "sk-stored"}}, self.secrets_file)
+        before = self.secrets_file.read_bytes()
+        self.assertEqual(get_api_key(self.base_dir, "Claude Opus 4"), "sk-stored")
+        self.assertFalse(Path(".gitignore").exists())
+        self.assertEqual(self.secrets_file.read_bytes(), before)
+
+
+class JsonlTests(_ChdirTestCase):
+    def test_append_after_torn_write_keeps_new_record(self):
+        log = Path("history.jsonl")
+        append_jsonl_file([{"n": 1}], log)
+        with open(log, "ab") as f:
+            f.write(b'{"n": 2, "content": "cut of')  # crash mid-append
+        append_jsonl_file([{"n": 3}], log)
+        self.assertEqual(load_jsonl_file(log), [{"n": 1}, {"n": 3}])
+        self.assertTrue(log.read_bytes().endswith(b"\n"))
+    
+    def test_append_keeps_complete_record_missing_newline(self):
+        log = Path("history.jsonl")
+        log.write_bytes(b'{"n": 1}\n{"n": 2}')
+        append_jsonl_file([{"n": 3}], log)
+        self.assertEqual(load_jsonl_file(log), [{"n": 1}, {"n": 2}, {"n": 3}])
+    
+    def test_long_torn_line_is_dropped(self):
+        log = Path("history.jsonl")
+        log.write_bytes(b'{"n": 1}\n{"content": "' + b"x" * 200_000)
+        append_jsonl_file([{"n": 2}], log)
+        self.assertEqual(load_jsonl_file(log), [{"n": 1}, {"n": 2}])
+    
+    def test_torn_first_line(self):
+        log = Path("history.jsonl")
+        log.write_bytes(b'{"n"')
+        append_jsonl_file([{"n": 1}], log)
+        self.assertEqual(load_jsonl_file(log), [{"n": 1}])
+    
+    def test_count_matches_loaded_records(self):
+        log = Path("history.jsonl")
+        for contents in (b"", b'{"n": 1}\n{"n": 2}\n', b'{"n": 1}\n{"n": 2}', b'{"n": 1}\n{"n": 2, "cont'):
+            log.write_bytes(contents)
+            self.assertEqual(count_history_file(log), len(load_jsonl_file(log)), contents)
+    
+    def test_count_skips_blank_lines_and_is_clamped(self):
+        log = Path("history.jsonl")
+        log.write_bytes(b"".join(b'{"n": %d}\n\n' % n for n in range(12)))
+        self.assertEqual(count_history_file(log), 12)
+        self.assertEqual(count_history_file(log, limit=10), 10)
+    
+    def test_count_legacy_history(self):
+        legacy = Path("history.json")
+        save_json_file([{"n": 1}, {"n": 2}], legacy)
+        self.assertEqual(count_history_file(legacy), 2)
+
+
+class IncludeCacheTests(_ChdirTestCase):
+    def _include(self, name):
+        return process_file_inclusions("{%s}" % name, self.base_dir, self.logger)
+    
+    def test_edited_file_replaces_its_cache_entry(self):
+        path = Path("notes.md")
+        path.write_text("v1\n")
+        self.assertTrue(self._include("notes.md").endswith("v1\n"))
+        path.write_text("version 2\n")
+        self.assertTrue(self._include("notes.md").endswith("version 2\n"))
+        self.assertEqual([key for key in _include_cache._entries if key.endswith("notes.md")],
+                         ["notes.md"])
+    
+    def test_header_follows_the_placeholder_not_the_cache(self):
+        Path("src").mkdir()
+        Path("src/a.py").write_text("x = 1\n")
+        self.assertEqual(self._include("a.py"), "# File: a.py (.py)\nx = 1\n")
+        self.assertEqual(self._include("src/a.py"), "# File: src/a.py (.py)\nx = 1\n")
+
+    def test_large_files_are_not_cached(self):
+        Path("big.txt").write_text("x" * _MMAP_READ_THRESHOLD)
+        self.assertEqual(len(self._include("big.txt")),
+                         len("// File: big.txt (.txt)\n") + _MMAP_READ_THRESHOLD)
+        self.assertNotIn("big.txt", _include_cache._entries)
+    
+    def test_cache_is_bounded_by_length(self):
+        cache = _IncludeCache(max_chars=10)
+        cache.put("a", 1, 4, "aaaa")
+        cache.put("b", 1, 4, "bbbb")
+        cache.put("c", 1, 4, "cccc")
+        self.assertIsNone(cache.get("a", 1, 4))
+        self.assertEqual(cache.get("c", 1, 4), "cccc")
+        self.assertLessEqual(cache._chars, 10)
+        self.assertIsNone(cache.get("c", 2, 4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -9,13 +9,66 @@ backup management, and file operations.
 import os
 import json
 import shutil
+import stat
+import heapq
+import mmap
 import logging
+import logging.handlers
 import re
+import functools
+import itertools
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, IO
+from collections import OrderedDict
 from datetime import datetime
 
-from config import SUPPORTED_EXTENSIONS
+from config import is_supported_ext
+
+try:
+    import orjson
+except ImportError:
+    # Fallback to the standard library if orjson is not available
+    orjson = None
+
+# Parse JSON from str or bytes (both parsers accept bytes directly)
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# {filename} placeholders expanded by process_file_inclusions (compiled once at import)
+FILE_INCLUSION_RE = re.compile(r'\{([^}]+)\}')
+
+_KB = 1024
+_MB = 1024 * 1024
+
+# Largest file process_file_inclusions will inline
+_MAX_INCLUDE_SIZE = 2 * _MB
+
+# Included files at least this large are decoded from an mmap (never 0: empty
+# files cannot be mapped)
+_MMAP_READ_THRESHOLD = 256 * _KB
+
+# Directories searched for included files, relative to the working directory;
+# the agent's uploads directory is appended per call by _search_paths()
+_BASE_SEARCH_PATHS = tuple(Path(p) for p in (
+    '.', 'src', 'lib', 'scripts', 'data', 'documents', 'files', 'config', 'configs'
+))
+
+
+def _json_default(obj: Any) -> Any:
+    """Serialize datetimes like orjson does for the stdlib fallback"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def json_dumps(data: Any, indent: bool = False) -> bytes:
+    """Serialize data to UTF-8 encoded JSON bytes"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(data, option=option)
+    if indent:
+        return json.dumps(data, indent=2, ensure_ascii=False, default=_json_default).encode('utf-8')
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=_json_default).encode('utf-8')
 
 
 def setup_directories(base_dir: Path) -> None:
@@ -34,10 +87,16 @@ def setup_directories(base_dir: Path) -> None:
 
 def setup_logging(agent_id: str, base_dir: Path) -> logging.Logger:
     """Setup logging for agent with file and console handlers"""
-    log_file = base_dir / "logs" / f"{datetime.now().strftime('%Y-%m-%d')}.log"
+    log_file = base_dir / "logs" / f"{time.strftime('%Y-%m-%d')}.log"
     
     logger = logging.getLogger(f"ClaudeAgent_{agent_id}")
     logger.setLevel(logging.INFO)
+    for handler in logger.handlers:
+        # Flush buffered records and release the log file of an earlier setup
+        target = getattr(handler, 'target', None)
+        handler.close()
+        if target is not None:
+            target.close()
     logger.handlers.clear()
     
     # File handler
@@ -47,40 +106,78 @@ def setup_logging(agent_id: str, base_dir: Path) -> logging.Logger:
     )
     file_handler.setFormatter(file_formatter)
     
+    # Buffer file records and write them in batches; warnings and above flush
+    # immediately, and logging.shutdown() flushes the rest at exit
+    buffered_handler = logging.handlers.MemoryHandler(
+        capacity=1024,
+        flushLevel=logging.WARNING,
+        target=file_handler,
+        flushOnClose=True
+    )
+    
     # Console handler (warnings and above only)
     console_handler = logging.StreamHandler()
     console_formatter = logging.Formatter('%(levelname)s: %(message)s')
     console_handler.setFormatter(console_formatter)
     console_handler.setLevel(logging.WARNING)
     
-    logger.addHandler(file_handler)
+    logger.addHandler(buffered_handler)
     logger.addHandler(console_handler)
     
     return logger
 
 
+@functools.lru_cache(maxsize=1)
+def _backup_timestamp(epoch_second: int) -> str:
+    """Local-time backup suffix, formatted once per second"""
+    return time.strftime("%Y%m%d_%H%M%S", time.localtime(epoch_second))
+
+
 def create_backup(history_file: Path, backup_dir: Path, max_backups: int = 10) -> None:
     """Create incremental backup of history file"""
     if not history_file.exists():
         return
         
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_file = backup_dir / f"history_{timestamp}.json"
+    timestamp = _backup_timestamp(int(time.time()))
+    backup_file = backup_dir / f"{history_file.stem}_{timestamp}{history_file.suffix}"
     
     try:
-        shutil.copy2(history_file, backup_file)
+        if backup_file.exists():
+            backup_file.unlink()
         
-        # Keep only the most recent backups
-        backups = sorted(backup_dir.glob("history_*.json"))
-        while len(backups) > max_backups:
-            oldest = backups.pop(0)
-            oldest.unlink()
+        # Hardlink the current file (no data copied); the history is always
+        # rewritten through os.replace, so the backup keeps the old contents
+        try:
+            os.link(history_file, backup_file)
+        except OSError:
+            # Different filesystem or no hardlink support
+            shutil.copy2(history_file, backup_file)
+        
+        # Keep only the most recent backups (timestamped names sort chronologically)
+        prefix, suffix = f"{history_file.stem}_", history_file.suffix
+        backups = [name for name in os.listdir(backup_dir)
+                   if name.startswith(prefix) and name.endswith(suffix)]
+        excess = len(backups) - max_backups
+        if excess > 0:
+            for oldest in heapq.nsmallest(excess, backups):
+                os.unlink(backup_dir / oldest)
             
     except Exception as e:
         # Log error but don't fail
         print(f"Warning: Could not create backup: {e}")
 
 
+def _gitignore_secrets() -> None:
+    """Add secrets files to .gitignore unless it already lists them"""
+    try:
+        gitignore_file = Path('.gitignore')
+        if not (gitignore_file.exists() and b'secrets.json' in gitignore_file.read_bytes()):
+            with open(gitignore_file, 'a') as f:
+                f.write('\n# API Keys\n**/secrets.json\nsecrets.json\n')
+    except Exception as e:
+        print(f"Warning: Could not add secrets.json to .gitignore: {e}")
+
+
 def get_api_key(base_dir: Path, model_name: str) -> str:
     """Get API key from environment or secrets file, prompt if needed"""
     # Try environment variable first
@@ -92,11 +189,10 @@ def get_api_key(base_dir: Path, model_name: str) -> str:
     secrets_file = base_dir / "secrets.json"
     if secrets_file.exists():
         try:
-            with open(secrets_file, 'r') as f:
-                secrets = json.load(f)
-                api_key = secrets.get('keys', {}).get('default')
-                if api_key:
-                    return api_key
+            stored = load_json_file(secrets_file)
+            api_key = stored.get('keys', {}).get('default')
+            if api_key:
+                return api_key
         except Exception as e:
             print(f"Warning: Could not read secrets file: {e}")
     
@@ -117,22 +213,13 @@ def get_api_key(base_dir: Path, model_name: str) -> str:
     }
     
     try:
-        with open(secrets_file, 'w') as f:
-            json.dump(secrets, f, indent=2)
-        
-        # Add to .gitignore
-        gitignore_file = Path('.gitignore')
-        gitignore_content = ""
-        if gitignore_file.exists():
-            gitignore_content = gitignore_file.read_text()
-        
-        if 'secrets.json' not in gitignore_content:
-            with open(gitignore_file, 'a') as f:
-                f.write('\n# API Keys\n**/secrets.json\nsecrets.json\n')
+        save_json_file(secrets, secrets_file)
         
         masked_key = f"{api_key[:4]}...{api_key[-2:]}" if len(api_key) > 6 else "***"
         print(f"API key saved ({masked_key})")
         
+        _gitignore_secrets()
+        
     except Exception as e:
         print(f"Warning: Could not save API key to file: {e}")
     
@@ -141,129 +228,389 @@ def get_api_key(base_dir: Path, model_name: str) -> str:
 
 def is_supported_file(file_path: Path) -> bool:
     """Check if file extension is supported for inclusion"""
-    return file_path.suffix.lower() in SUPPORTED_EXTENSIONS
+    return is_supported_ext(file_path.name)
+
+
+def _search_paths(base_dir: Path) -> tuple:
+    """Directories searched for included files, in priority order"""
+    return _BASE_SEARCH_PATHS + (base_dir / 'uploads',)
+
+
+def _decode_included(data) -> str:
+    """Decode included file bytes (or any buffer): UTF-8, falling back to latin-1"""
+    try:
+        file_content = str(data, 'utf-8')
+    except UnicodeDecodeError:
+        file_content = str(data, 'latin-1')
+    if '\r' in file_content:
+        # Universal newlines, as text-mode reads gave
+        file_content = file_content.replace('\r\n', '\n').replace('\r', '\n')
+    return file_content
+
+
+class _IncludeCache:
+    """Decoded included files by path, bounded by their total length.
+
+    One entry per path: when a file's (mtime, size) changes its new contents
+    replace the old ones, so edited files leave no stale copies behind. Least
+    recently used entries are evicted once max_chars is exceeded.
+    """
+    
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+        self._chars = 0
+    
+    def get(self, path_str: str, mtime_ns: int, size: int) -> Optional[str]:
+        cached = self._entries.get(path_str)
+        if cached is None or cached[:2] != (mtime_ns, size):
+            return None
+        self._entries.move_to_end(path_str)
+        return cached[2]
+    
+    def put(self, path_str: str, mtime_ns: int, size: int, content: str) -> None:
+        old = self._entries.pop(path_str, None)
+        if old is not None:
+            self._chars -= len(old[2])
+        self._entries[path_str] = (mtime_ns, size, content)
+        self._chars += len(content)
+        while self._chars > self.max_chars:
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self._chars -= len(evicted)
+
+
+_include_cache = _IncludeCache(max_chars=8 * _MB)
+
+
+def _render_included_file(path_str: str, mtime_ns: int, size: int, suffix: str, filename: str) -> str:
+    """Read an included file and prepend its header.
+
+    Contents of files below _MMAP_READ_THRESHOLD are memoized on (path, mtime,
+    size), so a file referenced on every turn is only re-read after it changes.
+    The header names the placeholder as written, so it is built on every call.
+    Larger files are decoded straight from a read-only mapping on each use and
+    never cached, so they are not held in memory between turns.
+    """
+    cacheable = size < _MMAP_READ_THRESHOLD
+    file_content = _include_cache.get(path_str, mtime_ns, size) if cacheable else None
+    
+    if file_content is None:
+        with open(path_str, 'rb') as f:
+            if cacheable:
+                file_content = _decode_included(f.read())
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    file_content = _decode_included(data)
+        if cacheable:
+            _include_cache.put(path_str, mtime_ns, size, file_content)
+    
+    # Add file info header
+    return get_file_header(filename, suffix) + file_content
 
 
 def process_file_inclusions(content: str, base_dir: Path, logger: logging.Logger) -> str:
     """Replace {filename} patterns with file content"""
-    def replace_file(match):
-        filename = match.group(1).strip()
-        
-        search_paths = [
-            Path('.'),
-            Path('src'),
-            Path('lib'),
-            Path('scripts'),
-            Path('data'),
-            Path('documents'),
-            Path('files'),
-            Path('config'),
-            Path('configs'),
-            base_dir / 'uploads'
-        ]
+    if '{' not in content:
+        return content
+    
+    search_paths = _search_paths(base_dir)
+    
+    def resolve(filename):
+        # The extension is the same under every search path: test it once, on the name alone
+        supported = is_supported_ext(os.path.basename(filename))
         
         for search_path in search_paths:
             file_path = search_path / filename
-            if file_path.exists() and file_path.is_file():
-                if not is_supported_file(file_path):
-                    logger.warning(f"Unsupported file type: {filename}")
-                    return f"[WARNING: Unsupported file type {filename}]"
+            # One stat answers exists/is-file and carries the size and mtime
+            try:
+                st = os.stat(file_path)
+            except (OSError, ValueError):
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            
+            if not supported:
+                logger.warning(f"Unsupported file type: {filename}")
+                return f"[WARNING: Unsupported file type {filename}]"
+            
+            # Check file size (max 2MB)
+            if st.st_size > _MAX_INCLUDE_SIZE:
+                logger.error(f"File {filename} too large (>2MB)")
+                return f"[ERROR: File {filename} too large (max 2MB)]"
+            
+            try:
+                full_content = _render_included_file(
+                    str(file_path), st.st_mtime_ns, st.st_size, file_path.suffix, filename
+                )
+                
+                logger.info(f"Included file: {filename} ({len(full_content)} chars, {file_path.suffix})")
+                return full_content
                 
-                try:
-                    # Check file size (max 2MB)
-                    max_size = 2 * 1024 * 1024
-                    if file_path.stat().st_size > max_size:
-                        logger.error(f"File {filename} too large (>2MB)")
-                        return f"[ERROR: File {filename} too large (max 2MB)]"
-                    
-                    # Try UTF-8 first, fallback to latin-1
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            file_content = f.read()
-                    except UnicodeDecodeError:
-                        with open(file_path, 'r', encoding='latin-1') as f:
-                            file_content = f.read()
-                    
-                    # Add file info header
-                    file_info = get_file_header(filename, file_path.suffix)
-                    full_content = file_info + file_content
-                    
-                    logger.info(f"Included file: {filename} ({len(file_content)} chars, {file_path.suffix})")
-                    return full_content
-                    
-                except Exception as e:
-                    logger.error(f"Error reading file {filename}: {e}")
-                    return f"[ERROR: Could not read {filename}: {e}]"
+            except Exception as e:
+                logger.error(f"Error reading file {filename}: {e}")
+                return f"[ERROR: Could not read {filename}: {e}]"
         
         logger.warning(f"File not found: {filename}")
         return f"[ERROR: File {filename} not found]"
     
-    return re.sub(r'\{([^}]+)\}', replace_file, content)
+    # A file referenced several times in one message is resolved (and logged) once
+    resolved: Dict[str, str] = {}
+    
+    def replace_file(match):
+        filename = match.group(1).strip()
+        if filename not in resolved:
+            resolved[filename] = resolve(filename)
+        return resolved[filename]
+    
+    return FILE_INCLUSION_RE.sub(replace_file, content)
+
+
+# Inclusion header comment per file type, filled with (filename, suffix)
+_DEFAULT_HEADER_TEMPLATE = "// File: {0} ({1})\n"
+_HEADER_TEMPLATES = {
+    **dict.fromkeys(('.py', '.r'), "# File: {0} ({1})\n"),
+    **dict.fromkeys(('.html', '.xml'), "<!-- File: {0} ({1}) -->\n"),
+    **dict.fromkeys(('.css', '.scss', '.sass'), "/* File: {0} ({1}) */\n"),
+    '.sql': "-- File: {0} ({1})\n",
+}
 
 
 def get_file_header(filename: str, suffix: str) -> str:
     """Get appropriate file header comment based on file type"""
-    suffix_lower = suffix.lower()
-    
-    if suffix_lower in ['.py', '.r']:
-        return f"# File: {filename} ({suffix})\n"
-    elif suffix_lower in ['.html', '.xml']:
-        return f"<!-- File: {filename} ({suffix}) -->\n"
-    elif suffix_lower in ['.css', '.scss', '.sass']:
-        return f"/* File: {filename} ({suffix}) */\n"
-    elif suffix_lower in ['.sql']:
-        return f"-- File: {filename} ({suffix})\n"
-    else:
-        return f"// File: {filename} ({suffix})\n"
+    return _HEADER_TEMPLATES.get(suffix.lower(), _DEFAULT_HEADER_TEMPLATE).format(filename, suffix)
+
+
+def _walk_visible_files(root: str) -> Iterator[os.DirEntry]:
+    """Yield file entries below root with a scandir walk, skipping dot-files and dot-dirs"""
+    try:
+        it = os.scandir(root)
+    except (OSError, ValueError):
+        return
+    with it:
+        for entry in it:
+            if entry.name.startswith('.'):
+                continue
+            # Links to files count as files; links to directories are never walked
+            if entry.is_dir(follow_symlinks=False):
+                yield from _walk_visible_files(entry.path)
+            elif entry.is_file():
+                yield entry
+
+
+def _collect_available_files(search_path: Path) -> List[str]:
+    """Listing lines for the supported files below one search path"""
+    files = []
+    for entry in _walk_visible_files(str(search_path)):
+        name = entry.name
+        if is_supported_ext(name):
+            try:
+                size = entry.stat().st_size
+            except OSError:
+                continue
+            suffix = os.path.splitext(name)[1]
+            if size < _MB:
+                files.append(f"{os.path.normpath(entry.path)} ({size:,} bytes) [{suffix}]")
+            else:
+                files.append(f"{os.path.normpath(entry.path)} ({size / _MB:.1f} MB) [{suffix}]")
+    return files
 
 
 def list_available_files(base_dir: Path) -> List[str]:
     """List all available files for inclusion"""
-    files = []
-    search_paths = [
-        Path('.'),
-        Path('src'),
-        Path('lib'),
-        Path('scripts'),
-        Path('data'),
-        Path('documents'),
-        Path('files'),
-        Path('config'),
-        Path('configs'),
-        base_dir / 'uploads'
-    ]
-    
-    for search_path in search_paths:
-        if search_path.exists():
-            for file_path in search_path.rglob("*"):
-                if (file_path.is_file() and 
-                    not file_path.name.startswith('.') and 
-                    is_supported_file(file_path)):
-                    
-                    size = file_path.stat().st_size
-                    size_str = f"{size:,} bytes" if size < 1024*1024 else f"{size/(1024*1024):.1f} MB"
-                    files.append(f"{file_path} ({size_str}) [{file_path.suffix}]")
-    
-    return sorted(files)
+    return sorted(itertools.chain.from_iterable(
+        _collect_available_files(search_path) for search_path in _search_paths(base_dir)
+    ))
 
 
 def save_json_file(data: Any, file_path: Path) -> None:
-    """Save data to JSON file with proper encoding"""
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Atomically save data to JSON file with proper encoding"""
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    tmp_path.write_bytes(json_dumps(data, indent=True) + b"\n")
+    os.replace(tmp_path, file_path)
 
 
 def load_json_file(file_path: Path) -> Any:
     """Load data from JSON file with proper encoding"""
+    return json_loads(file_path.read_bytes())
+
+
+@functools.lru_cache(maxsize=None)
+def _yaml():
+    """Import PyYAML on first use (only legacy configs need it) with its fastest loader"""
+    import yaml
+    try:
+        # libyaml-backed parser (~10x faster than pure Python)
+        from yaml import CSafeLoader as YamlLoader
+    except ImportError:
+        from yaml import SafeLoader as YamlLoader
+    return yaml, YamlLoader
+
+
+def load_yaml_file(file_path: Path) -> Any:
+    """Load data from YAML file with proper encoding"""
+    yaml, YamlLoader = _yaml()
     with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        try:
+            return yaml.load(f, Loader=YamlLoader)
+        except yaml.YAMLError as e:
+            # Surface as ValueError, like the JSON decoders, so callers need not import yaml
+            raise ValueError(f"Invalid YAML in {file_path}: {e}") from e
+
+
+def iter_jsonl_file(file_path: Path) -> Iterator[Any]:
+    """Yield records from a JSON-Lines file one at a time, skipping blank or truncated lines"""
+    with open(file_path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json_loads(line)
+            except json.JSONDecodeError:
+                # A partially written last line (e.g. after a crash) is dropped
+                continue
+
+
+def load_jsonl_file(file_path: Path) -> List[Any]:
+    """Load records from a JSON-Lines file, skipping blank or truncated lines"""
+    return list(iter_jsonl_file(file_path))
+
+
+def _unterminated_tail_start(f: IO[bytes]) -> int:
+    """Seek to where a last line left without its newline starts (the end if there is none)"""
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return end
+    f.seek(end - 1)
+    if f.read(1) == b"\n":
+        return end
+    
+    # Find where the unterminated line starts, reading backwards in blocks
+    start = end
+    while start > 0:
+        block_start = max(0, start - 64 * 1024)
+        f.seek(block_start)
+        newline = f.read(start - block_start).rfind(b"\n")
+        if newline != -1:
+            start = block_start + newline + 1
+            break
+        start = block_start
+    f.seek(start)
+    return start
+
+
+def _repair_jsonl_tail(f: IO[bytes]) -> None:
+    """Terminate or drop a last line left without its newline by a torn write"""
+    start = _unterminated_tail_start(f)
+    tail = f.read()
+    if not tail:
+        return
+    
+    try:
+        json_loads(tail)
+    except ValueError:
+        # Partial record: drop it so the next append starts on a fresh line
+        f.truncate(start)
+    else:
+        # Complete record, only the newline is missing
+        f.write(b"\n")
+
+
+def append_jsonl_file(records: Iterable[Any], file_path: Path) -> None:
+    """Append records to a JSON-Lines file, one JSON document per line"""
+    data = b"".join(json_dumps(record) + b"\n" for record in records)
+    with open(file_path, 'ab+') as f:
+        # A crash mid-append would otherwise glue the next record onto the partial one
+        _repair_jsonl_tail(f)
+        f.write(data)
+
+
+def save_jsonl_file(records: Iterable[Any], file_path: Path) -> None:
+    """Atomically rewrite a JSON-Lines file with the given records"""
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(b"".join(json_dumps(record) + b"\n" for record in records))
+    os.replace(tmp_path, file_path)
+
+
+def load_history_file(file_path: Path) -> Tuple[List[Dict[str, Any]], int]:
+    """Load a history log (history.jsonl) or a legacy history.json document.
+    
+    Also returns the number of lines in the log, blank and malformed ones
+    included, which is what log compaction is measured against.
+    """
+    if file_path.suffix != ".jsonl":
+        messages = _load_legacy_history(file_path)
+        return messages, len(messages)
+    
+    messages = []
+    lines = 0
+    with open(file_path, 'rb') as f:
+        for line in f:
+            lines += 1
+            if not line.strip():
+                continue
+            try:
+                messages.append(json_loads(line))
+            except json.JSONDecodeError:
+                continue
+    return messages, lines
+
+
+def _load_legacy_history(file_path: Path) -> List[Dict[str, Any]]:
+    """Load a legacy history.json document, which must be a JSON array"""
+    messages = load_json_file(file_path)
+    if not isinstance(messages, list):
+        raise ValueError(f"{file_path} does not hold a JSON array")
+    return messages
+
+
+def count_history_file(file_path: Path, limit: Optional[int] = None) -> int:
+    """Count the messages in a history log, counting lines instead of decoding each record.
+
+    Blank lines are skipped, as the loader does. The append-only log is only
+    compacted past its size limit, so pass the agent's max_history_size as
+    limit to count the messages it actually keeps.
+    """
+    if file_path.suffix != ".jsonl":
+        count = len(_load_legacy_history(file_path))
+    else:
+        count = 0
+        tail = b""
+        with open(file_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    tail = line
+                elif not line.isspace():
+                    count += 1
+        # Like the loader, count an unterminated last line only if it is a whole record
+        if tail and not tail.isspace():
+            try:
+                json_loads(tail)
+                count += 1
+            except ValueError:
+                pass
+    return count if limit is None else min(count, limit)
+
+
+def iter_history_file(file_path: Path) -> Iterator[Dict[str, Any]]:
+    """Iterate a history log without holding it in memory (legacy history.json is loaded whole)"""
+    if file_path.suffix == ".jsonl":
+        return iter_jsonl_file(file_path)
+    return iter(_load_legacy_history(file_path))
+
+
+def load_config_file(file_path: Path) -> Dict[str, Any]:
+    """Load an agent config (config.json) or a legacy config.yaml document"""
+    if file_path.suffix == ".json":
+        return load_json_file(file_path)
+    return load_yaml_file(file_path)
 
 
 def format_file_size(size_bytes: int) -> str:
     """Format file size in human readable format"""
-    if size_bytes < 1024:
+    if size_bytes < _KB:
         return f"{size_bytes} bytes"
-    elif size_bytes < 1024 * 1024:
-        return f"{size_bytes / 1024:.1f} KB"
+    elif size_bytes < _MB:
+        return f"{size_bytes / _KB:.1f} KB"
     else:
-        return f"{size_bytes / (1024 * 1024):.1f} MB"
\ No newline at end of file
+        return f"{size_bytes / _MB:.1f} MB"
\ No newline at end of file